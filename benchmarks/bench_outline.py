@@ -0,0 +1,74 @@
+"""Micro-benchmark and visual check for the welcome text outline modes.
+
+    python benchmarks/bench_outline.py [--iterations 50] [--size 1500]
+
+Draws the welcome text with every mode in `OUTLINE_MODES` on the same
+background, reports the per-image time and speedup over "legacy", and the
+pixel difference against the "legacy" output. The "template" row composites
+pre-rasterized masks the way cached welcome templates do.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from welcome_assets import WelcomeAssetCache, build_text_mask
+from welcome_renderer import OUTLINE_MODES, draw_outlined_text, paste_text_mask
+
+LINES = ("Welcome,", "gumball_enjoyer_9000!")
+FILL = (240, 120, 200)
+OUTLINE = (30, 40, 160)
+
+
+def render(base, font, mode, template=None):
+    image = base.copy()
+    if mode == "template":
+        welcome_mask, name_mask, line_step = template
+        paste_text_mask(image, welcome_mask, (100, 100), FILL, OUTLINE)
+        paste_text_mask(image, name_mask, (100, 100 + line_step), FILL, OUTLINE)
+    else:
+        draw_outlined_text(image, (100, 100), "\n".join(LINES), font, FILL, OUTLINE, mode=mode)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--size", type=int, default=1500, help="Background width and height in pixels")
+    args = parser.parse_args()
+
+    font = WelcomeAssetCache(".").get_font(90)
+    base = Image.new("RGBA", (args.size, args.size), (90, 200, 140, 255))
+    reference = render(base, font, "legacy")
+
+    # Masks as a cached welcome template holds them (line step as in WelcomeAssetCache)
+    draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    line_step = draw.multiline_textbbox((0, 0), "A\nA", font=font)[3] - draw.textbbox((0, 0), "A", font=font)[3]
+    template = (build_text_mask(LINES[0], font, 3), build_text_mask(LINES[1], font, 3), line_step)
+
+    modes = OUTLINE_MODES + ("template",)
+    timings = {}
+    for mode in modes:
+        render(base, font, mode, template)  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            render(base, font, mode, template)
+        timings[mode] = (time.perf_counter() - start) / args.iterations
+
+    print(f"{'mode':<8} {'ms/image':>10} {'speedup':>8} {'mean diff':>10} {'pixels >32':>11}")
+    for mode in modes:
+        diff = ImageChops.difference(render(base, font, mode, template), reference).convert("L")
+        mean_diff = ImageStat.Stat(diff).mean[0]
+        changed = sum(diff.histogram()[33:]) / (diff.width * diff.height)
+        print(
+            f"{mode:<8} {timings[mode] * 1000:>10.2f} {timings['legacy'] / timings[mode]:>7.1f}x "
+            f"{mean_diff:>10.3f} {changed:>10.3%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Memory benchmark for StreakTracker under a stream of unique authors.
+
+    python benchmarks/bench_streaks.py [--messages 2000000] [--rate 500] [--max-entries 100000]
+
+Feeds `--messages` gumball mentions from distinct author ids at `--rate`
+messages per simulated second and prints live entries, heap size and traced
+memory at regular checkpoints. Memory should level off once the 600 s window
+(or `--max-entries`) is reached instead of growing with the stream.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from streak_tracker import StreakTracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2_000_000)
+    parser.add_argument("--rate", type=float, default=500, help="Messages per simulated second")
+    parser.add_argument("--max-entries", type=int, default=100_000)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    args = parser.parse_args()
+
+    tracker = StreakTracker(window=600, max_entries=args.max_entries)
+    step = max(1, args.messages // args.checkpoints)
+    base_id = 10**17
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    print(f"{'messages':>10} {'live':>8} {'heap':>8} {'traced MiB':>11} {'peak MiB':>9}")
+    for i in range(1, args.messages + 1):
+        tracker.hit(base_id + i, i / args.rate)
+        if i % step == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{i:>10} {len(tracker):>8} {len(tracker._heap):>8} {current / 2**20:>11.1f} {peak / 2**20:>9.1f}")
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    print(f"{args.messages / elapsed:,.0f} hits/s (with tracemalloc enabled)")
+
+
+if __name__ == "__main__":
+    main()
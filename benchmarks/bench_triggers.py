@@ -0,0 +1,58 @@
+"""Throughput benchmark for the trigger engine.
+
+    python benchmarks/bench_triggers.py [--terms 500] [--messages 20000]
+
+Builds an automaton from `--terms` synthetic terms plus "gumball*" and
+matches `--messages` synthetic chat messages against it, comparing messages
+per second with a naive per-term `in` scan of the lowercased message.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from trigger_engine import TriggerAutomaton
+
+CHATTER = "gm frens the machine is spinning again who minted the rare one lol wen reveal gumball".split()
+
+
+def random_word(rng, low=4, high=10):
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(low, high)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    terms = [random_word(rng) for _ in range(args.terms)]
+    vocabulary = CHATTER + terms[:20]
+    messages = [" ".join(rng.choices(vocabulary, k=rng.randint(3, 30))) for _ in range(args.messages)]
+
+    start = time.perf_counter()
+    automaton = TriggerAutomaton({"gumball": ["gumball*"], "forbidden": terms})
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    hits = sum(len(automaton.find(m)) for m in messages)
+    engine_rate = args.messages / (time.perf_counter() - start)
+
+    naive_terms = ["gumball"] + terms
+    start = time.perf_counter()
+    naive_hits = sum(1 for m in messages for t in naive_terms if t in m.lower())
+    naive_rate = args.messages / (time.perf_counter() - start)
+
+    print(f"automaton: {automaton.size} terms built in {build_ms:.1f} ms")
+    print(f"automaton: {engine_rate:>12,.0f} msg/s ({hits} whole-word hits)")
+    print(f"naive in : {naive_rate:>12,.0f} msg/s ({naive_hits} substring hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""Offline load test for the bot.py event handlers.
+
+    python benchmarks/loadtest.py [--duration 10] [--messages-per-sec 50] [--gumball-ratio 0.3]
+                                  [--joins-per-sec 2] [--leaves-per-sec 1] [--mints-per-sec 2]
+                                  [--json] [--max-p99-ms 250]
+
+Imports bot.py without connecting to Discord, swaps the client's channel and
+guild lookups for in-process fakes, then replays synthetic traffic against
+on_message, on_member_join and on_member_remove at the requested rates.
+Joins and leaves cycle through the members recorded in joins_leaves.log,
+chatter mixes in "gumball" mentions, and mint webhooks post embeds to the
+relay source channel. Each event runs as its own task, as discord.py does.
+
+Reports throughput, p50/p99/max handler latency per event type, event-loop
+lag and memory. All state files are written to a temporary directory. With
+--max-p99-ms the exit status is non-zero when any handler's p99 exceeds the
+budget, so the run can gate CI.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.abspath(REPO_ROOT))
+
+import discord
+from PIL import Image
+
+from event_log import LEGACY_LINE
+
+
+# ---------------------------------------------------------------------- fakes
+
+class FakeRole:
+    def __init__(self, role_id, name):
+        self.id = role_id
+        self.name = name
+
+
+class FakeGuild:
+    def __init__(self, guild_id, name="Cosmic Gumball (load test)"):
+        self.id = guild_id
+        self.name = name
+        self.roles = [FakeRole(1, "ON FIRE 🔥")]
+        self.members = {}
+
+    def get_role(self, role_id):
+        return next((r for r in self.roles if r.id == role_id), None)
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+
+class FakeMember:
+    def __init__(self, user_id, name, guild, bot=False):
+        self.id = user_id
+        self.name = name
+        self.mention = f"<@{user_id}>"
+        self.bot = bot
+        self.guild = guild
+        self.roles = []
+
+    def get_role(self, role_id):
+        return next((r for r in self.roles if r.id == role_id), None)
+
+    async def add_roles(self, *roles, reason=None):
+        self.roles.extend(roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        self.roles = [r for r in self.roles if r not in roles]
+
+
+class FakeChannel:
+    def __init__(self, channel_id, guild, send_latency):
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.guild = guild
+        self.send_latency = send_latency
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent += 1
+        return object()
+
+    async def history(self, limit=None, after=None, oldest_first=False):
+        return
+        yield
+
+
+class FakeMessage:
+    _ids = itertools.count(1 << 40)
+
+    def __init__(self, content, author, channel, embeds=(), webhook_id=None):
+        self.id = next(self._ids)
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.embeds = list(embeds)
+        self.attachments = []
+        self.webhook_id = webhook_id
+        self.type = discord.MessageType.default
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+# ---------------------------------------------------------------------- setup
+
+def load_bot(workdir, send_latency, backgrounds, background_size):
+    """Imports bot.py inside `workdir` and points it at fake channels."""
+    bg_dir = os.path.join(workdir, "backgrounds")
+    os.makedirs(bg_dir)
+    for i in range(backgrounds):
+        Image.new("RGB", (background_size, background_size), (40 * i % 255, 90, 160)).save(os.path.join(bg_dir, f"bg{i}.png"))
+
+    os.chdir(workdir)
+    import bot as bot_module
+    from outbound import RateBucket
+    from welcome_renderer import WelcomeRenderer
+
+    guild = FakeGuild(bot_module.GUILD_ID)
+    channels = {}
+
+    def get_channel(channel_id):
+        if channel_id not in channels:
+            channels[channel_id] = FakeChannel(channel_id, guild, send_latency)
+        return channels[channel_id]
+
+    bot = bot_module.bot
+    bot.get_channel = get_channel
+    bot.get_guild = lambda guild_id: guild
+
+    async def process_commands(message):
+        return None
+    bot.process_commands = process_commands
+
+    # Fake channels have no rate limits; keep the dispatcher's queueing and coalescing only
+    bot_module.outbound.channel_rate = (10**9, 1.0)
+    bot_module.outbound.global_bucket = RateBucket(10**9, 1.0)
+
+    old_renderer = bot_module.welcome_renderer
+    bot_module.welcome_renderer = WelcomeRenderer(
+        bg_dir,
+        mode=old_renderer.mode,
+        workers=old_renderer.workers,
+        max_pending=old_renderer.max_pending,
+        image_format=old_renderer.image_format,
+        outline_mode=old_renderer.outline_mode,
+        max_output_size=old_renderer.max_output_size,
+    )
+    return bot_module, guild, channels
+
+
+def legacy_members(guild):
+    """Members seen in joins_leaves.log, falling back to synthetic ones."""
+    members = {}
+    try:
+        with open(os.path.join(REPO_ROOT, "joins_leaves.log"), encoding="utf-8") as f:
+            for line in f:
+                match = LEGACY_LINE.match(line)
+                if match:
+                    members[int(match["id"])] = match["name"]
+    except FileNotFoundError:
+        pass
+    if not members:
+        members = {10**17 + i: f"member_{i}" for i in range(100)}
+    return [FakeMember(user_id, name, guild) for user_id, name in members.items()]
+
+
+# ---------------------------------------------------------------------- traffic
+
+async def drive(rate, duration, make_event, latencies, tasks):
+    """Starts one handler task per event at a fixed open-loop rate."""
+    if rate <= 0:
+        return
+    interval = 1.0 / rate
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for n in itertools.count():
+        due = start + n * interval
+        if due - start >= duration:
+            return
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.add(loop.create_task(timed(make_event(), latencies)))
+
+
+async def timed(coro, latencies):
+    start = time.perf_counter()
+    try:
+        await coro
+    finally:
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure_lag(samples, interval=0.05):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+def summarize(latencies, duration):
+    if not latencies:
+        return {"events": 0}
+    ordered = sorted(latencies)
+    return {
+        "events": len(ordered),
+        "per_sec": len(ordered) / duration,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def run(args, bot_module, guild, channels):
+    # Loads state and warms the renderer the way GumballBot.login does, minus the gateway
+    await bot_module.bot.warm_up()
+    # Catch up the (empty) relay feeds, as on_ready does, so live relays are released
+    await bot_module.relay_router.catch_up()
+
+    members = legacy_members(guild)
+    for member in members:
+        guild.members[member.id] = member
+    authors = [FakeMember(2 * 10**17 + i, f"chatter_{i}", guild) for i in range(args.authors)]
+    for author in authors:
+        guild.members[author.id] = author
+
+    general = bot_module.bot.get_channel(bot_module.GENERAL_CHANNEL_ID)
+    mint_feed = bot_module.bot.get_channel(bot_module.MINT_FEED_CHANNEL_ID)
+    webhook = FakeMember(3 * 10**17, "Mint Feed Webhook", guild, bot=True)
+    rng = random.Random(args.seed)
+    member_cycle = itertools.cycle(members)
+
+    def chatter():
+        text = "gm frens the machine is spinning"
+        if rng.random() < args.gumball_ratio:
+            text = "who else loves a good gumball"
+        return bot_module.on_message(FakeMessage(text, rng.choice(authors), general))
+
+    def mint():
+        embed = discord.Embed(title=f"Cosmic Gumball #{rng.randint(1, 10000)} minted", description="A new gumball rolls out")
+        return bot_module.on_message(FakeMessage("", webhook, mint_feed, embeds=[embed], webhook_id=1))
+
+    results = {name: [] for name in ("on_message", "mint", "on_member_join", "on_member_remove")}
+    tasks = set()
+    lag = []
+    lag_task = asyncio.get_running_loop().create_task(measure_lag(lag))
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        drive(args.messages_per_sec, args.duration, chatter, results["on_message"], tasks),
+        drive(args.mints_per_sec, args.duration, mint, results["mint"], tasks),
+        drive(args.joins_per_sec, args.duration, lambda: bot_module.on_member_join(next(member_cycle)), results["on_member_join"], tasks),
+        drive(args.leaves_per_sec, args.duration, lambda: bot_module.on_member_remove(next(member_cycle)), results["on_member_remove"], tasks),
+    )
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await bot_module.outbound.drain()
+    elapsed = time.perf_counter() - start
+    lag_task.cancel()
+
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    return {
+        "duration_s": elapsed,
+        "handlers": {name: summarize(latencies, elapsed) for name, latencies in results.items()},
+        "event_loop_lag_ms": {
+            "p50": statistics.median(lag) * 1000 if lag else 0.0,
+            "max": max(lag) * 1000 if lag else 0.0,
+        },
+        "outbound": {
+            "api_sends": sum(c.sent for c in channels.values()),
+            "messages": sum(s["messages"] for s in bot_module.outbound.stats().values()),
+        },
+        "startup_ms": {name: duration * 1000 for name, (_, duration) in bot_module.startup_timer.report()},
+        "memory": {
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "traced_peak_mb": peak / 2**20 if peak is not None else None,
+        },
+    }
+
+
+def print_report(report):
+    print(f"Ran for {report['duration_s']:.1f}s")
+    print(f"{'handler':<18} {'events':>7} {'per sec':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, s in report["handlers"].items():
+        if s["events"]:
+            print(f"{name:<18} {s['events']:>7} {s['per_sec']:>8.1f} {s['p50_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f}")
+    lag = report["event_loop_lag_ms"]
+    print(f"event loop lag: p50 {lag['p50']:.2f} ms, max {lag['max']:.2f} ms")
+    out = report["outbound"]
+    print(f"outbound: {out['messages']} messages in {out['api_sends']} sends")
+    print("startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in report["startup_ms"].items()))
+    mem = report["memory"]
+    traced = f", traced peak {mem['traced_peak_mb']:.1f} MiB" if mem["traced_peak_mb"] is not None else ""
+    print(f"memory: max RSS {mem['max_rss_mb']:.1f} MiB{traced}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--messages-per-sec", type=float, default=50)
+    parser.add_argument("--gumball-ratio", type=float, default=0.3)
+    parser.add_argument("--authors", type=int, default=200)
+    parser.add_argument("--joins-per-sec", type=float, default=2)
+    parser.add_argument("--leaves-per-sec", type=float, default=1)
+    parser.add_argument("--mints-per-sec", type=float, default=2)
+    parser.add_argument("--send-latency-ms", type=float, default=50, help="Simulated Discord API latency per send")
+    parser.add_argument("--backgrounds", type=int, default=4)
+    parser.add_argument("--background-size", type=int, default=1200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="Trace Python allocations (slower)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit non-zero if any handler's p99 exceeds this")
+    args = parser.parse_args()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory(prefix="gumball-loadtest-") as workdir:
+        bot_module, guild, channels = load_bot(workdir, args.send_latency_ms / 1000, args.backgrounds, args.background_size)
+        report = asyncio.run(run(args, bot_module, guild, channels))
+        bot_module.member_events.close()
+        bot_module.welcome_renderer.shutdown()
+        os.chdir(REPO_ROOT)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.max_p99_ms is not None:
+        slow = [name for name, s in report["handlers"].items() if s["events"] and s["p99_ms"] > args.max_p99_ms]
+        if slow:
+            print(f"p99 budget of {args.max_p99_ms} ms exceeded by: {', '.join(slow)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
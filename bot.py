@@ -1,30 +1,102 @@
+from startup import startup_timer  # first, so startup timings cover the other imports
 import discord
 from discord.ext import commands
 from discord.ui import View, Button
 import os
 from dotenv import load_dotenv
-from mint_relay import relay_mint_message, MINT_FEED_CHANNEL_ID, RELAY_CHANNEL_ID
+from log_setup import setup_logging, get_logger
+from mint_relay import RelayRouter, MINT_FEED_CHANNEL_ID
 import logging
-from PIL import Image, ImageDraw, ImageFont
-import os
-import random
-import json
 import asyncio
+import datetime
+import functools
+import time
+from welcome_renderer import WelcomeRenderer
+from outbound import OutboundDispatcher
+from shrine_store import ShrineStore
+from event_log import MemberEventLog
+from streak_tracker import StreakTracker
+from scheduler import JobScheduler
+from trigger_engine import TriggerEngine
+from guild_config import GuildConfigStore, GUILD_CONFIG_FILE
+from verification import VerificationService
+from metrics import metrics
+import importlib
 
 load_dotenv()
 
+# Metrics were created on import, before .env was read; apply METRICS_ENABLED now
+metrics.configure()
+
+# Queue-backed logging (formatting and I/O happen on a listener thread), levels per subsystem
+setup_logging()
+chat_log = get_logger("chat")
+relay_log = get_logger("relay")
+startup_timer.mark("imports")
+
+# BOT_SHARDED=1 runs every shard in this process on AutoShardedBot (SHARD_COUNT overrides Discord's recommendation)
+SHARDED = os.getenv("BOT_SHARDED", "0").lower() in ("1", "true", "yes")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+
 BACKGROUND_DIR = "../frogs/collections/10-cosmic-gumball-machine/frogs_art_engine/media/layers/core_layers/background"
 
+# Welcome images render on a worker pool ("thread" or "process") with a bounded queue.
+# Sharded deployments default to one process pool that every shard shares.
+welcome_renderer = WelcomeRenderer(
+    BACKGROUND_DIR,
+    mode=os.getenv("WELCOME_RENDER_MODE", "process" if SHARDED else "thread"),
+    workers=int(os.getenv("WELCOME_RENDER_WORKERS", "2")),
+    max_pending=int(os.getenv("WELCOME_RENDER_MAX_PENDING", "8")),
+    max_cache_bytes=int(os.getenv("WELCOME_CACHE_MB", "256")) * 1024 * 1024,
+    image_format=os.getenv("WELCOME_IMAGE_FORMAT", "png"),
+    compress_level=int(os.getenv("WELCOME_PNG_COMPRESS_LEVEL", "6")),
+    quality=int(os.getenv("WELCOME_WEBP_QUALITY", "80")),
+    outline_mode=os.getenv("WELCOME_OUTLINE_MODE", "dilate"),
+    max_output_size=int(os.getenv("WELCOME_MAX_SIZE", "1024")),
+)
+
 
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 
+# The original server; used when guild_configs.json is missing and for pre-multi-guild data
 GUILD_ID = 1286858214767333499
 GENERAL_CHANNEL_ID = 1336212816415424513
 WELCOME_CHANNEL_ID = 1336547290298581065
 VERIFY_HUMAN_CHANNEL_ID = 1336547466799222814
+VERIFY_GUMBALL_CHANNEL_ID = 1336547518288498698
+VERIFY_TRAITS_CHANNEL_ID = 1336547704037314631
 VERIFIED_ROLE_ID = 1339113346229862460
 SHRINE_CHANNEL_ID = 1339853650650206292
-SHRINE_FILE = "gumball_shrine.json"
+SHRINE_FILE = "gumball_shrine.json"  # Legacy counter, imported into SHRINE_DB_FILE once
+SHRINE_DB_FILE = "gumball_shrine.db"
+JOINS_LEAVES_LOG = "joins_leaves.log"  # Legacy free-text log, imported into MEMBER_EVENTS_FILE once
+MEMBER_EVENTS_FILE = "member_events.jsonl"
+STREAKS_FILE = "gumball_streaks.json"
+SCHEDULED_JOBS_FILE = "scheduled_jobs.json"
+
+FIRE_ROLE_NAME = "ON FIRE 🔥"
+FIRE_ROLE_SECONDS = 3600
+
+# Failed timed-role removals (outages, rate limits) are retried this long after, a few times
+ROLE_REMOVAL_RETRY_SECONDS = 60
+ROLE_REMOVAL_MAX_ATTEMPTS = 5
+
+# How long shutdown waits for queued outbound messages (announcements, welcomes) to go out
+OUTBOUND_DRAIN_TIMEOUT = float(os.getenv("OUTBOUND_DRAIN_TIMEOUT_SECONDS", "10"))
+
+DEFAULT_GUILD_CONFIG = {
+    GUILD_ID: {
+        "name": "The Cosmic Gumball Machine",
+        "general_channel": GENERAL_CHANNEL_ID,
+        "welcome_channel": WELCOME_CHANNEL_ID,
+        "verify_human_channel": VERIFY_HUMAN_CHANNEL_ID,
+        "verify_gumball_channel": VERIFY_GUMBALL_CHANNEL_ID,
+        "verify_traits_channel": VERIFY_TRAITS_CHANNEL_ID,
+        "shrine_channel": SHRINE_CHANNEL_ID,
+        "verified_role": VERIFIED_ROLE_ID,
+        "fire_role_name": FIRE_ROLE_NAME,
+    }
+}
 
 
 intents = discord.Intents.default()
@@ -34,21 +106,176 @@ intents.message_content = True  # Explicitly enable message content intent
 intents.guilds = True
 intents.webhooks = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class GumballBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state_loaded = asyncio.Event()  # handlers wait on this before touching persisted state
+        self.connect_started = None
+        self._warm_up_task = None
+
+    async def login(self, token):
+        # ✅ Load state and warm the renderer while the login request and gateway handshake run
+        self._warm_up_task = asyncio.get_running_loop().create_task(self.warm_up())
+        with startup_timer.phase("login"):
+            await super().login(token)
+
+    async def connect(self, *, reconnect=True):
+        self.connect_started = time.perf_counter()
+        await super().connect(reconnect=reconnect)
+
+    async def warm_up(self):
+        """Loads persisted state on worker threads, concurrently, then warms the welcome renderer."""
+        with startup_timer.phase("state"):
+            results = await asyncio.gather(
+                startup_timer.run("guild_configs", guild_configs.load),
+                startup_timer.run("shrine", shrine_store.load),
+                startup_timer.run("member_events", member_events.load, JOINS_LEAVES_LOG),
+                startup_timer.run("streaks", functools.partial(gumball_streaks.restore, STREAKS_FILE, legacy_guild_id=GUILD_ID)),
+                startup_timer.run("scheduler", scheduler.load),
+                startup_timer.run("relay_routes", relay_router.load),
+                return_exceptions=True,
+            )
+        for result in results:
+            if isinstance(result, Exception):
+                logging.error(f"❌ Failed to load state during startup: {result}")
+        self.state_loaded.set()
+
+        # ✅ Periodically expire and persist gumball streaks (only once they've been restored)
+        asyncio.get_running_loop().create_task(gumball_streaks.run_snapshots(STREAKS_FILE))
+
+        # ✅ Start the render pool and decode backgrounds ahead of the first join
+        with startup_timer.phase("renderer"):
+            await welcome_renderer.warm()
+
+    async def setup_hook(self):
+        # ✅ Re-register the verify button so messages posted before a restart keep working
+        self.add_view(VerifyButton())
+
+        # ✅ Start the job scheduler once guilds are cached (overdue jobs run right away)
+        self.loop.create_task(self._run_scheduler())
+
+        # ✅ Track event-loop lag and optionally serve metrics locally
+        self.loop.create_task(metrics.monitor_loop_lag())
+        if os.getenv("METRICS_PORT"):
+            await metrics.serve(port=int(os.getenv("METRICS_PORT")))
+
+    async def _run_scheduler(self):
+        await self.state_loaded.wait()
+        await self.wait_until_ready()
+        await scheduler.run()
+
+    async def close(self):
+        # ✅ Deliver queued messages while the connection is still up (bounded, so shutdown can't hang)
+        try:
+            await asyncio.wait_for(outbound.drain(), timeout=OUTBOUND_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"⚠️ Shutting down with {outbound.depth()} outbound messages still queued.")
+
+        # ✅ Commit queued shrine records and streaks before disconnecting (never overwrite unloaded state)
+        if self.state_loaded.is_set():
+            await shrine_store.close()
+            member_events.close()
+            gumball_streaks.snapshot(STREAKS_FILE)
+        welcome_renderer.shutdown()
+        await super().close()
+
+
+bot = GumballBot(command_prefix="!", intents=intents, shard_count=SHARD_COUNT)
+
+# Persisted state is created here but loaded by GumballBot.warm_up, alongside the gateway login
+
+# Channel and role ids per server (guild_configs.json), looked up by guild id
+guild_configs = GuildConfigStore(GUILD_CONFIG_FILE, default=DEFAULT_GUILD_CONFIG)
+
+# All event-driven sends go through one queue per channel (rate-limited, coalesced)
+outbound = OutboundDispatcher(linger=float(os.getenv("OUTBOUND_LINGER_SECONDS", "0.25")))
+
+# Verified-member index per guild, with a queued, rate-limited worker for role changes
+verification = VerificationService(bot)
+
+def ensure_verification_index(guild):
+    """Indexes a configured guild on first use (clicks and commands can arrive before on_ready indexes it)."""
+    config = guild_configs.get(guild.id)
+    if config:
+        verification.ensure_indexed(guild, config.verified_role_id)
+
+# Load the shrine store (imports the legacy JSON count on first run); numbering is per guild
+shrine_store = ShrineStore(SHRINE_DB_FILE, legacy_file=SHRINE_FILE, default_guild_id=GUILD_ID)
+
+# Structured join/leave log indexed per (guild, user); untagged older records belong to GUILD_ID
+member_events = MemberEventLog(MEMBER_EVENTS_FILE, default_guild_id=GUILD_ID)
+
+# Gumball streaks, keyed by (guild id, user id), survive restarts through periodic snapshots
+gumball_streaks = StreakTracker(window=600)
+
+# Delayed jobs (e.g. ON FIRE role removals), persisted across restarts
+scheduler = JobScheduler(SCHEDULED_JOBS_FILE)
+
+
+def role_removal_key(guild_id, user_id):
+    return f"fire:{guild_id}:{user_id}"
+
+
+def retry_role_removal(payload, reason):
+    """Reschedules a failed removal shortly, unless it has used up its attempts or was re-scheduled since."""
+    key = role_removal_key(payload["guild_id"], payload["user_id"])
+    attempts = payload.get("attempts", 0) + 1
+    if attempts >= ROLE_REMOVAL_MAX_ATTEMPTS:
+        logging.error(f"❌ Giving up on timed role removal for user {payload['user_id']} after {attempts} attempts: {reason}")
+        return
+    if key in scheduler:
+        return  # a newer removal for this member is already scheduled
+    delay = ROLE_REMOVAL_RETRY_SECONDS * attempts
+    logging.warning(f"⚠️ Timed role removal for user {payload['user_id']} failed ({reason}), retrying in {delay}s.")
+    scheduler.schedule("remove_role", key, delay, {**payload, "attempts": attempts})
+
+
+async def remove_roles_batch(payloads):
+    """Scheduled job handler: removes timed roles for one guild's batch of members.
+
+    Each member is handled on its own, so one failure can't strand the rest of the batch.
+    """
+    guild = bot.get_guild(payloads[0]["guild_id"])
+    if not guild:
+        # Likely a guild outage; try the whole batch again later
+        for payload in payloads:
+            retry_role_removal(payload, "guild unavailable")
+        return
+
+    roles = {}
+    for payload in payloads:
+        role_id = payload["role_id"]
+        if role_id not in roles:
+            roles[role_id] = guild.get_role(role_id)
+        role = roles[role_id]
+        member = guild.get_member(payload["user_id"])
+
+        # Skip the API call entirely when there's nothing to remove
+        if not role or not member or not member.get_role(role_id):
+            continue
+        try:
+            await member.remove_roles(role, reason="Timed role expired")
+        except (discord.Forbidden, discord.NotFound) as e:
+            # Permanent: missing permissions or the member/role is gone
+            logging.error(f"❌ Can't remove {role.name} from {member.name}: {e}")
+        except Exception as e:
+            retry_role_removal(payload, e)
+        else:
+            logging.info(f"🔥 {member.name} no longer {role.name}.")
+
+scheduler.register("remove_role", remove_roles_batch, group_by="guild_id")
+
+
+def load_trigger_terms():
+    """Re-imports data/forbidden_language.py so edits apply on !reloadtriggers."""
+    import data.forbidden_language as forbidden_language
+    return importlib.reload(forbidden_language).TRIGGER_TERMS
 
-# Ensure shrine file exists or create it
-if not os.path.exists(SHRINE_FILE):
-    logging.warning("⚠️ Shrine JSON file not found. Creating a new one.")
-    with open(SHRINE_FILE, "w") as f:
-        json.dump({"count": 0}, f)
+# Relay routes (relay_routes.json), each feed with a persisted high-water mark for catch-up
+relay_router = RelayRouter(bot, outbound)
 
-# Load shrine data
-try:
-    with open(SHRINE_FILE, "r") as f:
-        shrine_data = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    logging.error(f"❌ Failed to load shrine data: {e}")
-    shrine_data = {"count": 0}  # Default if the file is corrupt
+# Keyword triggers for on_message, matched in one pass per message
+trigger_engine = TriggerEngine(load_trigger_terms)
 
 
 
@@ -60,90 +287,46 @@ class VerifyButton(View):
 
     @discord.ui.button(label="Verify Me!", style=discord.ButtonStyle.green, custom_id="verify_human")
     async def verify_button(self, interaction: discord.Interaction, button: Button):
-        """Assigns the Verified Human role when clicked."""
+        """Queues the Verified Human role for the member who clicked."""
         
         if interaction.guild is None:
             logging.warning("⚠️ Verification interaction received outside a server. Ignoring.")
             await interaction.response.send_message("❌ This action can only be performed inside a server.", ephemeral=True)
             return
 
+        # ✅ Acknowledge within Discord's 3 s deadline; the role change happens on the verification worker
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await bot.state_loaded.wait()
+
         guild = interaction.guild
         member = interaction.user
-        role = guild.get_role(VERIFIED_ROLE_ID)
+        ensure_verification_index(guild)
 
-        if not role:
-            await interaction.response.send_message("❌ Verification failed. Role not found.", ephemeral=True)
-            logging.error("❌ Verified Human role not found.")
+        # ✅ O(1) index lookup instead of scanning member.roles
+        if verification.is_verified(guild.id, member.id):
+            await interaction.followup.send("✅ You are already verified!", ephemeral=True)
             return
 
-        if role in member.roles:
-            await interaction.response.send_message("✅ You are already verified!", ephemeral=True)
+        result = await verification.request(guild.id, member.id, verify=True, urgent=True)
+        if result is None:
+            await interaction.followup.send("❌ Verification failed. Please try again later.", ephemeral=True)
+        elif result is False:
+            await interaction.followup.send("✅ You are already verified!", ephemeral=True)
         else:
-            await member.add_roles(role)
-            await interaction.response.send_message("🎉 You are now verified!", ephemeral=True)
+            await interaction.followup.send("🎉 You are now verified!", ephemeral=True)
             logging.info(f"✅ {member.name} verified as human.")
 
 
 
-def generate_welcome_image(username):
-    """Generates a welcome image with a random background."""
-    try:
-        # ✅ Get a random background image
-        background_files = [f for f in os.listdir(BACKGROUND_DIR) if f.endswith((".png", ".jpg", ".jpeg"))]
-        if not background_files:
-            logging.error("❌ No background images found in the directory!")
-            return None
-
-        random_background = random.choice(background_files)
-        background_path = os.path.join(BACKGROUND_DIR, random_background)
-
-        logging.info(f"🎨 Selected background: {random_background}")
-
-        # ✅ Load the background image
-        background = Image.open(background_path).convert("RGBA")
-
-        # ✅ Define text overlay
-        draw = ImageDraw.Draw(background)
-        font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"  # Change this if you have a custom font
-        font = ImageFont.truetype(font_path, 90)
-
-        text = f"Welcome,\n{username}!"
-        text_position = (100, 100)  # Adjust placement
-        text_color = (random.randint(1, 255), random.randint(1, 255), random.randint(1, 255))
-        outline_color = (random.randint(1, 255), random.randint(1, 255), random.randint(1, 255))
-
-        offsets = [-3, -2, -1, 1, 2, 3]
-
-        # ✅ Draw outline first (multiple times for effect)
-        for x_offset in offsets:
-            for y_offset in offsets:
-                outline_position = (text_position[0] + x_offset, text_position[1] + y_offset)
-                draw.text(outline_position, text, font=font, fill=outline_color)
-
-        # ✅ Draw main text on top
-        draw.text(text_position, text, font=font, fill=text_color)
-
-        # ✅ Save image to a temp file
-        output_path = f"welcome_{username}.png"
-        background.save(output_path)
-        return output_path
-
-    except Exception as e:
-        logging.error(f"❌ Error generating welcome image: {e}")
-        return None
-
-
-
-
-
 @bot.command(name="lastmint")
 async def last_mint(ctx):
-    """Fetches the most recent mint embed from the Mint Feed channel and relays it."""
+    """Relays the most recent Mint Feed message through the relay routes, unless it was already relayed."""
     mint_channel = bot.get_channel(MINT_FEED_CHANNEL_ID)  # Get the mint feed channel
+    feed = relay_router.feeds.get(MINT_FEED_CHANNEL_ID)
 
-    if not mint_channel:
+    if not mint_channel or not feed:
         await ctx.send("❌ I can't find the mint feed channel.")
-        logging.error("❌ Mint feed channel not found.")
+        logging.error("❌ Mint feed channel not found (or it has no relay route).")
         return
 
     try:
@@ -164,42 +347,159 @@ async def last_mint(ctx):
     logging.info(f"📝 Author: {last_message.author}")
     logging.info(f"📝 Embeds: {last_message.embeds}")
 
-    relay_channel = bot.get_channel(RELAY_CHANNEL_ID)  # Get the relay channel
+    if not last_message.embeds:
+        await ctx.send("❌ The last mint message did not contain an embed.")
+        logging.warning("❌ Last message had no embed, nothing to relay.")
+        return
 
-    if relay_channel:
-        # Check if the message contains an embed
-        if last_message.embeds:
-            embed = last_message.embeds[0]  # Get the first embed
-            logging.info(f"✅ Relaying embed: {embed.to_dict()}")  # Log embed data
-            await relay_channel.send(embed=embed)
-            await ctx.send("✅ Last mint embed has been relayed!")
-        else:
-            await ctx.send("❌ The last mint message did not contain an embed.")
-            logging.warning("❌ Last message had no embed, nothing to relay.")
+    # ✅ Same path as live relays: every embed, every route, never twice
+    if await feed.on_message(last_message):
+        await ctx.send(f"✅ Last mint has been relayed ({len(last_message.embeds)} embed(s))!")
     else:
-        await ctx.send("❌ I can't find the relay channel.")
-        logging.error("❌ Relay channel not found.")
+        await ctx.send("ℹ️ The last mint was already relayed (or no route accepts it).")
 
 
 
 
 @bot.command(name="status")
 async def status(ctx):
-    """Replies with a list of servers and channels the bot is monitoring."""
-    guilds = bot.guilds  # Get all servers the bot is in
-
+    """Replies with the servers the bot is in and the channels it is monitoring."""
     status_message = "🟢 **The Cosmic Gumball is Live!**\n\n"
-    status_message += "**Connected Servers & Channels:**\n"
+    status_message += f"Connected to {len(bot.guilds)} server(s) on {bot.shard_count or 1} shard(s), {len(guild_configs)} configured.\n\n"
+    status_message += "**Monitored Channels:**\n"
 
-    for guild in guilds:
-        status_message += f"🔹 **{guild.name}** (ID: {guild.id})\n"
+    monitored = set(relay_router.feeds)
+    for route in relay_router.routes:
+        monitored.update(route.targets)
+
+    # Look up only the monitored channels instead of walking every guild's channel list
+    by_guild = {}
+    for channel_id in sorted(monitored):
+        channel = bot.get_channel(channel_id)
+        if channel:
+            by_guild.setdefault(channel.guild, []).append(channel)
 
-        for channel in guild.text_channels:
-            if channel.id in [MINT_FEED_CHANNEL_ID, RELAY_CHANNEL_ID]:  # Check monitored channels
-                status_message += f"   📌 Monitoring: {channel.name} (ID: {channel.id})\n"
+    for guild, channels in by_guild.items():
+        status_message += f"🔹 **{guild.name}** (ID: {guild.id})\n"
+        for channel in channels:
+            status_message += f"   📌 Monitoring: {channel.name} (ID: {channel.id})\n"
 
     await ctx.send(status_message)
 
+@bot.command(name="shrine")
+async def shrine(ctx, number: int = None):
+    """Shows a specific enshrined gumball, or the most recent ones, for this server."""
+    if ctx.guild is None:
+        await ctx.send("❌ The shrine only exists inside a server.")
+        return
+
+    if number is not None:
+        rows = [row] if (row := await shrine_store.get(ctx.guild.id, number)) else []
+        if not rows:
+            await ctx.send(f"❌ No record of Gumball #{number} in the shrine.")
+            return
+    else:
+        rows = await shrine_store.recent(ctx.guild.id, 5)
+
+    lines = [f"🌌 **Gumball Shrine** ({shrine_store.count(ctx.guild.id)} gumballs enshrined)"]
+    for gumball_number, user_id, name, enshrined_at in rows:
+        lines.append(f"🍬 Gumball #{gumball_number}: **{name}** (enshrined <t:{int(enshrined_at)}:R>)")
+    await ctx.send("\n".join(lines))
+
+@bot.command(name="history")
+async def history(ctx, user: discord.User):
+    """Shows how many times a user has joined and left this server, with their latest events."""
+    if ctx.guild is None:
+        await ctx.send("❌ Join/leave history is only available inside a server.")
+        return
+
+    events = member_events.history(ctx.guild.id, user.id)
+    if not events:
+        await ctx.send(f"📒 No join/leave history for {user.name}.")
+        return
+
+    joins, leaves = member_events.counts(ctx.guild.id, user.id)
+    lines = [f"📒 **{user.name}** has joined {joins} time(s) and left {leaves} time(s)."]
+    for timestamp, event, name, gumball in events[-10:]:
+        when = f"<t:{int(timestamp)}:f>" if timestamp else "before structured logging"
+        emoji = "🟢" if event == "join" else "🔴"
+        suffix = f" (Gumball #{gumball})" if gumball else ""
+        lines.append(f"{emoji} {event} as {name}{suffix}, {when}")
+    await ctx.send("\n".join(lines))
+
+@bot.command(name="reloadtriggers")
+@commands.has_permissions(administrator=True)
+async def reload_triggers(ctx):
+    """Rebuilds the trigger engine from data/forbidden_language.py."""
+    try:
+        count = trigger_engine.reload()
+    except Exception as e:
+        logging.error(f"❌ Failed to reload trigger terms: {e}")
+        await ctx.send(f"❌ Failed to reload trigger terms: {e}")
+        return
+    await ctx.send(f"🔁 Trigger engine reloaded with {count} terms.")
+
+@bot.command(name="relaystats")
+async def relay_stats(ctx):
+    """Shows per-route relay throughput and latency."""
+    lines = ["🟣 **Relay routes:**"]
+    for route in relay_router.stats():
+        lines.append(
+            f"🔹 **{route['name']}** → {route['targets']} target(s): {route['matched']} relayed "
+            f"({route['per_minute']:.2f}/min), {route['filtered']} filtered, {route['sent']} sent, {route['failed']} failed, "
+            f"latency avg {route['latency_avg']:.2f}s / max {route['latency_max']:.2f}s"
+        )
+    await ctx.send("\n".join(lines))
+
+@bot.command(name="perf")
+@commands.has_permissions(administrator=True)
+async def perf(ctx):
+    """Shows latency percentiles for handlers, rendering, sends and event-loop lag."""
+    if not metrics.enabled:
+        await ctx.send("📈 Metrics are disabled (set METRICS_ENABLED=1).")
+        return
+
+    lines = ["📈 **Performance** (ms)", "```", f"{'metric':<20} {'count':>7} {'p50':>8} {'p99':>8} {'max':>8}"]
+    for name, summary in metrics.snapshot().items():
+        lines.append(
+            f"{name:<20} {summary['count']:>7} {summary['p50'] * 1000:>8.1f} "
+            f"{summary['p99'] * 1000:>8.1f} {summary['max'] * 1000:>8.1f}"
+        )
+    lines.append("```")
+    lines.append(f"📬 Outbound queued: {outbound.depth()} | 🎨 Renders pending: {welcome_renderer.pending}")
+    await ctx.send("\n".join(lines))
+
+@bot.command(name="startup")
+@commands.has_permissions(administrator=True)
+async def startup_report(ctx):
+    """Shows when each startup phase ran and how long it took, plus time-to-ready."""
+    lines = ["🚀 **Startup** (ms since process start)", "```", f"{'phase':<16} {'start':>8} {'took':>8}"]
+    for name, (start, duration) in startup_timer.report():
+        lines.append(f"{name:<16} {start * 1000:>8.0f} {duration * 1000:>8.0f}")
+    lines.append("```")
+    if startup_timer.ready_at is not None:
+        lines.append(f"⏱️ Time to ready: {startup_timer.ready_at * 1000:.0f} ms")
+    else:
+        lines.append("⏱️ Not ready yet.")
+    await ctx.send("\n".join(lines))
+
+@bot.command(name="outbound")
+@commands.has_permissions(administrator=True)
+async def outbound_status(ctx):
+    """Shows outbound queue depth and send counters per channel."""
+    stats = outbound.stats()
+    if not stats:
+        await ctx.send("📭 No outbound messages yet.")
+        return
+
+    lines = [f"📬 **Outbound queue** ({outbound.depth()} queued)"]
+    for channel_id, s in stats.items():
+        lines.append(
+            f"🔹 <#{channel_id}>: {s['queued']} queued, {s['messages']} delivered in {s['sent']} sends "
+            f"({s['coalesced']} coalesced), {s['dropped']} dropped, {s['failed']} failed"
+        )
+    await ctx.send("\n".join(lines))
+
 @bot.command(name="testwelcome")
 async def test_welcome(ctx):
     """Simulates a new user joining for testing."""
@@ -207,43 +507,79 @@ async def test_welcome(ctx):
     logging.info(f"🛠️ Simulating welcome for {fake_user.name}")
     await on_member_join(fake_user)
 
+@bot.event
+async def on_connect():
+    # ✅ A new gateway session (not a resume) may have missed mints; hold live relays until catch-up
+    relay_router.pause()
+
+@bot.event
+async def on_shard_ready(shard_id):
+    # ✅ A shard that re-identified after startup doesn't trigger on_ready again, so catch up here
+    if startup_timer.ready_at is not None:
+        await relay_router.catch_up()
+
 @bot.event
 async def on_ready():
     print(f"{bot.user} is now online and rolling! 🍬")
+    if startup_timer.ready_at is None and bot.connect_started is not None:
+        startup_timer.record("gateway", bot.connect_started, time.perf_counter())
+
+    await bot.state_loaded.wait()
+
+    # ✅ Index verified members per configured guild (members are cached by now)
+    with startup_timer.phase("verify_index"):
+        for config in guild_configs:
+            guild = bot.get_guild(config.guild_id)
+            if guild:
+                verification.index_guild(guild, config.verified_role_id)
+
+    # ✅ Relay any mints posted while we were disconnected (needs the saved high-water marks)
+    with startup_timer.phase("relay_catch_up"):
+        await relay_router.catch_up()
+
+    startup_timer.ready()
 
 @bot.event
+@metrics.instrument("on_member_join")
 async def on_member_join(member):
     
     """Logs a new member joining and announces in the general chat."""
-    general_channel = bot.get_channel(GENERAL_CHANNEL_ID)
+    await bot.state_loaded.wait()
+    config = guild_configs.get(member.guild.id)
+    if not config:
+        return  # Server isn't configured
+
+    general_channel = bot.get_channel(config.general_channel_id)
     if not general_channel:
         logging.error("❌ General channel not found.")
         return
 
     # Log the join event
-    with open("joins_leaves.log", "a") as log_file:
-        log_file.write(f"🟢 {member.name} ({member.id}) joined the server.\n")
+    member_events.record("join", member.guild.id, member.id, member.name)
+
+    server_name = config.name or member.guild.name
 
     # Send a simple message in general chat
-    await general_channel.send(f"🍬 {member.mention} just joined the Cosmic Gumball Machine!")
+    outbound.send(general_channel, f"🍬 {member.mention} just joined {server_name}!", coalesce=True)
     
     """Sends a custom welcome message with a random background image."""
-    channel = bot.get_channel(WELCOME_CHANNEL_ID)
+    channel = bot.get_channel(config.welcome_channel_id)
     if not channel:
         logging.error("❌ Welcome channel not found.")
         return
 
     logging.info(f"👤 New member joined: {member.name}")
 
-    # ✅ Generate the welcome image
-    image_path = generate_welcome_image(member.name)
-    if image_path:
-        file = discord.File(image_path, filename="welcome.png")
+    # ✅ Generate the welcome image on the render pool
+    with metrics.timer("welcome_render"):
+        image_buffer = await welcome_renderer.render(member.name)
+    if image_buffer:
+        file = discord.File(image_buffer, filename=welcome_renderer.filename)
 
-        # ✅ Define channel links
-        verify_human_channel = bot.get_channel(1336547466799222814)  # Replace with actual channel ID
-        verify_gumball_channel = bot.get_channel(1336547518288498698)  # Replace with actual ID
-        verify_traits_channel = bot.get_channel(1336547704037314631)  # Replace with actual ID
+        # ✅ Define channel links (from this server's config)
+        verify_human_channel = bot.get_channel(config.verify_human_channel_id)
+        verify_gumball_channel = bot.get_channel(config.verify_gumball_channel_id)
+        verify_traits_channel = bot.get_channel(config.verify_traits_channel_id)
 
         verify_human_link = f"<#{verify_human_channel.id}>" if verify_human_channel else "⚠️ Channel Not Found"
         verify_gumball_link = f"<#{verify_gumball_channel.id}>" if verify_gumball_channel else "⚠️ Channel Not Found"
@@ -251,7 +587,7 @@ async def on_member_join(member):
 
         # ✅ Embed with verification steps
         embed = discord.Embed(
-            title=f"🎉 Welcome to the Cosmic Gumball Machine, {member.name}! 🍬",
+            title=f"🎉 Welcome to {server_name}, {member.name}! 🍬",
             description=(
                 "Verify you are a human, verify your gumballs, and discover if you have any rare traits!\n\n"
                 f"🔹 **Verify human:** {verify_human_link}\n"
@@ -260,16 +596,14 @@ async def on_member_join(member):
             ),
             color=discord.Color.gold()
         )
-        embed.set_image(url="attachment://welcome.png")
+        embed.set_image(url=f"attachment://{welcome_renderer.filename}")
 
-        await channel.send(f"Welcome, {member.mention}! 🍬", file=file, embed=embed)
-
-        # ✅ Cleanup temp image file
-        os.remove(image_path)
+        outbound.send(channel, f"Welcome, {member.mention}! 🍬", file=file, embed=embed)
     else:
-        await channel.send(f"Welcome, {member.mention}! 🍬 (Image failed to generate)")
+        outbound.send(channel, f"Welcome, {member.mention}! 🍬 (Image failed to generate)", coalesce=True)
 
 @bot.event
+@metrics.instrument("on_message")
 async def on_message(message):
     # ✅ Ignore messages that aren't from a server (DMs, webhooks, etc.)
     if message.guild is None:
@@ -280,98 +614,92 @@ async def on_message(message):
     if message.author.bot and message.webhook_id is None:
         return
 
-    logging.info(f"📩 Message received in {message.guild.name}, channel: {message.channel.name} ({message.channel.id}): {message.content}")
+    # ✅ Wait for startup to finish loading state (returns immediately afterwards)
+    await bot.state_loaded.wait()
 
-    # ✅ Detect Webhook Messages in Mint Feed Channel
-    if message.channel.id == MINT_FEED_CHANNEL_ID:
-        logging.info(f"🔍 Detected a message in the Mint Feed Channel from {message.author.name} (Webhook: {message.webhook_id is not None})")
-        logging.info(f"📝 Message Type: {message.type}")
-        logging.info(f"📝 Embeds: {message.embeds}")
-        logging.info(f"📝 Attachments: {message.attachments}")
+    chat_log.info("📩 Message received in %s, channel: %s (%s): %s", message.guild.name, message.channel.name, message.channel.id, message.content)
 
-        relay_channel = bot.get_channel(RELAY_CHANNEL_ID)
+    # ✅ Detect messages in any relay source channel (Mint Feed and friends)
+    if message.channel.id in relay_router.feeds:
+        relay_log.info("🔍 Detected a message in a relay source channel from %s (Webhook: %s)", message.author.name, message.webhook_id is not None)
+        relay_log.debug("📝 Message Type: %s", message.type)
+        relay_log.debug("📝 Embeds: %s", message.embeds)
+        relay_log.debug("📝 Attachments: %s", message.attachments)
 
-        if relay_channel:
-            if message.embeds:
-                embed = message.embeds[0]  # Get the first embed
-                logging.info(f"✅ Instantly relaying mint embed from webhook: {embed.to_dict()}")
-                await relay_channel.send(embed=embed)
-            else:
-                logging.warning("❌ Webhook message had no embed, skipping relay.")
-        else:
-            logging.error("❌ Relay channel not found.")
+        # ✅ Relay to every route, in order, skipping anything catch-up already relayed
+        await relay_router.on_message(message)
 
     # ✅ Process bot commands first
     if message.content.startswith("!"):
-        logging.info(f"✅ Processing command: {message.content}")
+        chat_log.info("✅ Processing command: %s", message.content)
         await bot.process_commands(message)
         return  # Exit early, don’t check for relays
 
+    # ✅ Match every trigger term in a single pass
+    triggers = trigger_engine.categories(message.content)
+
+    if "forbidden" in triggers:
+        chat_log.warning("🚫 Forbidden language from %s in %s.", message.author.name, message.channel.name)
+
     # ✅ Gumball Alert System with Streak Tracking
-    if "gumball" in message.content.lower():  # Check for "gumball" (case-insensitive)
-        general_channel = bot.get_channel(GENERAL_CHANNEL_ID)
+    config = guild_configs.get(message.guild.id)
+    if "gumball" in triggers and config:
+        general_channel = bot.get_channel(config.general_channel_id)
 
         # ✅ First-time alert message (kept from original)
         if general_channel:
-            await general_channel.send(
-                f"🍬 **Gumball Alert!** {message.author.mention} just said gumball! 🟣🔵🟢"
+            outbound.send(
+                general_channel,
+                f"🍬 **Gumball Alert!** {message.author.mention} just said gumball! 🟣🔵🟢",
+                coalesce=True,
             )
 
-        # Ensure user streaks are tracked
-        if not hasattr(bot, "gumball_streaks"):
-            bot.gumball_streaks = {}
-
-        author_id = message.author.id
-
-        if author_id not in bot.gumball_streaks:
-            bot.gumball_streaks[author_id] = {"count": 0, "last_message_time": None}
-
-        # Reset streak if more than 10 minutes have passed
-        last_time = bot.gumball_streaks[author_id]["last_message_time"]
-        if last_time and (message.created_at - last_time).total_seconds() > 600:
-            bot.gumball_streaks[author_id]["count"] = 0
-
-        # Increase count and update last message time
-        bot.gumball_streaks[author_id]["count"] += 1
-        bot.gumball_streaks[author_id]["last_message_time"] = message.created_at
-        streak_count = bot.gumball_streaks[author_id]["count"]
+        # Count this mention towards the author's streak (resets after 10 quiet minutes)
+        streak_count = gumball_streaks.hit((message.guild.id, message.author.id), message.created_at.timestamp())
 
         # Response based on streak count
         if streak_count == 2:
-            await general_channel.send(
+            outbound.send(
+                general_channel,
                 f"🟢🔵🟣 **Gumball Alert Update!** {message.author.mention} has said gumball again! "
-                f"The gumball energy is rising... 🍬"
+                f"The gumball energy is rising... 🍬",
+                coalesce=True,
             )
         elif streak_count == 3:
-            await general_channel.send(
+            outbound.send(
+                general_channel,
                 f"🟢🔵🟣 **GUMBALL ALERT INTENSIFYING!** {message.author.mention} has now said gumball **3 times in a row!** "
-                f"The system is detecting a surge in gumball frequency! 🍬🟢🔵"
+                f"The system is detecting a surge in gumball frequency! 🍬🟢🔵",
+                coalesce=True,
             )
         elif streak_count == 4:
-            await general_channel.send(
+            outbound.send(
+                general_channel,
                 f"🔴🟠🟡 **🚨 GUMBALL ALERT LEVEL 4 🚨** {message.author.mention} is approaching critical gumball mass! "
-                f"Prepare for possible containment breach! 🍬🟢🔵🟣🔴"
+                f"Prepare for possible containment breach! 🍬🟢🔵🟣🔴",
+                coalesce=True,
             )
         elif streak_count == 5:
-            await general_channel.send(
+            outbound.send(
+                general_channel,
                 f"🔴🟠🟡 **🚨🚨 MAXIMUM GUMBALL ALERT 🚨🚨** {message.author.mention} has reached **5 consecutive gumball mentions!** "
-                f"**The Gumball System is at full capacity! MULTICOLORED GUMBALLS ARE EVERYWHERE!** 🟢🔵🟣🔴🟠🟡🍬"
+                f"**The Gumball System is at full capacity! MULTICOLORED GUMBALLS ARE EVERYWHERE!** 🟢🔵🟣🔴🟠🟡🍬",
+                coalesce=True,
             )
 
             # Assign "ON FIRE 🔥" role
-            fire_role = discord.utils.get(message.guild.roles, name="ON FIRE 🔥")
+            fire_role = discord.utils.get(message.guild.roles, name=config.fire_role_name)
             if fire_role:
                 await message.author.add_roles(fire_role)
                 logging.info(f"🔥 {message.author.name} has been given the ON FIRE 🔥 role.")
 
-                # Remove role after 1 hour
-                async def remove_fire_role():
-                    await asyncio.sleep(3600)  # 1 hour
-                    if fire_role in message.author.roles:
-                        await message.author.remove_roles(fire_role)
-                        logging.info(f"🔥 {message.author.name} no longer ON FIRE.")
-
-                bot.loop.create_task(remove_fire_role())
+                # Remove role after 1 hour (persisted, so it survives restarts)
+                scheduler.schedule(
+                    "remove_role",
+                    role_removal_key(message.guild.id, message.author.id),
+                    FIRE_ROLE_SECONDS,
+                    {"guild_id": message.guild.id, "user_id": message.author.id, "role_id": fire_role.id},
+                )
 
     await bot.process_commands(message)  # Ensure other commands still work
 
@@ -410,8 +738,9 @@ async def check_last_message(ctx):
 @bot.command(name="setupverify")
 @commands.has_permissions(administrator=True)
 async def setup_verify(ctx):
-    """Posts the verification button in the verify-human channel."""
-    channel = bot.get_channel(VERIFY_HUMAN_CHANNEL_ID)
+    """Posts the verification button in this server's verify-human channel."""
+    config = guild_configs.get(ctx.guild.id) if ctx.guild else None
+    channel = bot.get_channel(config.verify_human_channel_id) if config else None
     if not channel:
         logging.error("❌ Verify-human channel not found.")
         return
@@ -425,51 +754,121 @@ async def setup_verify(ctx):
     await channel.send(embed=embed, view=VerifyButton())
     await ctx.send("✅ Verification message posted!")
 
+@bot.command(name="bulkverify")
+@commands.has_permissions(administrator=True)
+async def bulk_verify(ctx, members: commands.Greedy[discord.Member]):
+    """Verifies the mentioned members, or every unverified human when none are given."""
+    ensure_verification_index(ctx.guild)
+    if verification.stats(ctx.guild.id) is None:
+        await ctx.send("❌ Verification isn't set up for this server.")
+        return
+
+    verified = verification.verified_ids(ctx.guild.id)
+    targets = [m.id for m in (members or ctx.guild.members) if not m.bot and m.id not in verified]
+    queued = verification.request_many(ctx.guild.id, targets, verify=True)
+    stats = verification.stats(ctx.guild.id)
+    await ctx.send(f"🛂 Queued {queued} verifications ({stats['pending']} pending, ~{stats['eta_seconds'] / 60:.1f} min).")
+
+@bot.command(name="bulkunverify")
+@commands.has_permissions(administrator=True)
+async def bulk_unverify(ctx, minutes: int):
+    """Unverifies every member who joined in the last `minutes` minutes (e.g. after a raid)."""
+    ensure_verification_index(ctx.guild)
+    if verification.stats(ctx.guild.id) is None:
+        await ctx.send("❌ Verification isn't set up for this server.")
+        return
+
+    cutoff = discord.utils.utcnow() - datetime.timedelta(minutes=minutes)
+    verified = verification.verified_ids(ctx.guild.id)
+    targets = [m.id for m in ctx.guild.members if m.id in verified and m.joined_at and m.joined_at >= cutoff]
+    queued = verification.request_many(ctx.guild.id, targets, verify=False)
+    stats = verification.stats(ctx.guild.id)
+    await ctx.send(
+        f"🛂 Queued {queued} unverifications for members who joined in the last {minutes} min "
+        f"({stats['pending']} pending, ~{stats['eta_seconds'] / 60:.1f} min)."
+    )
+
+@bot.command(name="verifyaudit")
+@commands.has_permissions(administrator=True)
+async def verify_audit(ctx):
+    """Reconciles the verified-member index with the role and reports counts and queue progress."""
+    config = guild_configs.get(ctx.guild.id)
+    ensure_verification_index(ctx.guild)
+    if not config or verification.stats(ctx.guild.id) is None:
+        await ctx.send("❌ Verification isn't set up for this server.")
+        return
+
+    drift = verification.index_guild(ctx.guild, config.verified_role_id)
+    verified = verification.verified_ids(ctx.guild.id)
+    bots = sum(1 for m in ctx.guild.members if m.bot)
+    unverified = sum(1 for m in ctx.guild.members if not m.bot and m.id not in verified)
+    stats = verification.stats(ctx.guild.id)
+
+    await ctx.send("\n".join([
+        f"🛂 **Verification audit** for {ctx.guild.name}",
+        f"✅ Verified: {stats['verified']} | ❔ Unverified humans: {unverified} | 🤖 Bots: {bots}",
+        f"🔧 Index entries corrected: {drift}",
+        f"📬 Queue: {stats['pending']} pending (~{stats['eta_seconds'] / 60:.1f} min), {stats['applied']} applied, "
+        f"{stats['skipped']} skipped, {stats['failed']} failed",
+    ]))
+
+@bot.command(name="verifycancel")
+@commands.has_permissions(administrator=True)
+async def verify_cancel(ctx):
+    """Drops this server's queued bulk verify/unverify changes (button clicks are kept)."""
+    dropped = verification.cancel(ctx.guild.id)
+    await ctx.send(f"🛑 Dropped {dropped} queued role changes.")
+
+@bot.event
+async def on_member_update(before, after):
+    """Keeps the verified-member index in step with role changes made anywhere."""
+    verification.on_member_update(before, after)
+
 @bot.event
+@metrics.instrument("on_member_remove")
 async def on_member_remove(member):
     """Logs a member leaving, announces in general, and enshrines them in the Gumball Shrine."""
-    general_channel = bot.get_channel(GENERAL_CHANNEL_ID)
-    shrine_channel = bot.get_channel(SHRINE_CHANNEL_ID)
+    await bot.state_loaded.wait()
+    verification.discard(member.guild.id, member.id)
+    config = guild_configs.get(member.guild.id)
+    if not config:
+        return  # Server isn't configured
+
+    general_channel = bot.get_channel(config.general_channel_id)
+    shrine_channel = bot.get_channel(config.shrine_channel_id)
 
     if not general_channel:
         logging.error("❌ General channel not found.")
         return
     if not shrine_channel:
-        logging.error("❌ Shrine channel not found. Check SHRINE_CHANNEL_ID.")
+        logging.error(f"❌ Shrine channel not found. Check shrine_channel for guild {member.guild.id}.")
         return
 
-    # Increment shrine counter
-    shrine_data["count"] += 1
-    gumball_number = shrine_data["count"]
+    # Enshrine the member (the record is written in the background)
+    gumball_number = shrine_store.enshrine(member.guild.id, member.id, member.name)
+    if gumball_number is None:
+        member_events.record("leave", member.guild.id, member.id, member.name)
+        return  # Shrine store failed to load; don't announce a number it can't keep
 
     logging.info(f"🔢 Gumball count incremented: {gumball_number}")
 
-    # Save updated shrine count
-    try:
-        with open(SHRINE_FILE, "w") as f:
-            json.dump(shrine_data, f)
-        logging.info(f"✅ Shrine data updated: {shrine_data}")
-    except Exception as e:
-        logging.error(f"❌ Failed to save shrine data: {e}")
-
     # Log the leave event
-    with open("joins_leaves.log", "a") as log_file:
-        log_file.write(f"🔴 {member.name} ({member.id}) left the server. Gumball #{gumball_number} added to the shrine.\n")
+    member_events.record("leave", member.guild.id, member.id, member.name, gumball=gumball_number)
+
+    server_name = config.name or member.guild.name
 
     # Send a simple message in general chat
-    await general_channel.send(f"🍬 {member.name} has transcended the Cosmic Gumball Machine... Gumball #{gumball_number} now drifts through the cosmos.")
+    outbound.send(general_channel, f"🍬 {member.name} has transcended {server_name}... Gumball #{gumball_number} now drifts through the cosmos.", coalesce=True)
 
     # Enshrine them in the shrine channel
     shrine_message = (
         f"🌌 **Gumball #{gumball_number}: {member.name}** 🌌\n"
-        f"They have left the Cosmic Gumball Machine and are now enshrined as a luminous gumball, forever floating in the fabric of the cosmos. 🛸✨"
+        f"They have left {server_name} and are now enshrined as a luminous gumball, forever floating in the fabric of the cosmos. 🛸✨"
     )
 
-    try:
-        await shrine_channel.send(shrine_message)
-        logging.info(f"✅ Successfully enshrined Gumball #{gumball_number} ({member.name}) in the shrine.")
-    except Exception as e:
-        logging.error(f"❌ Failed to send shrine message: {e}")
+    outbound.send(shrine_channel, shrine_message)
+    logging.info(f"✅ Queued shrine message for Gumball #{gumball_number} ({member.name}).")
 
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    bot.run(TOKEN, log_handler=None)  # logging is already configured by setup_logging()
@@ -0,0 +1,8 @@
+# Trigger terms for the on_message trigger engine, grouped by category.
+# Terms match whole words, case-insensitively; a trailing * matches a word prefix.
+# Edit this file and run !reloadtriggers to apply changes without a restart.
+
+TRIGGER_TERMS = {
+    "gumball": ["gumball*"],
+    "forbidden": [],
+}
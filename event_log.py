@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+# Legacy joins_leaves.log lines, e.g.
+#   🟢 name (123) joined the server.
+#   🔴 name (123) left the server. Gumball #7 added to the shrine.
+LEGACY_LINE = re.compile(
+    r"^(?P<emoji>🟢|🔴) (?P<name>.+) \((?P<id>\d+)\) (?P<action>joined|left) the server\."
+    r"(?: Gumball #(?P<gumball>\d+) added to the shrine\.)?\s*$"
+)
+
+_STOP = object()
+
+
+class MemberEventLog:
+    """Structured join/leave log written as JSONL by a background thread.
+
+    Each record is one compact JSON object per line::
+
+        {"t":1739577600.0,"e":"leave","gd":456,"id":123,"n":"name","g":7}
+
+    `t` is a Unix timestamp (null for imported legacy lines), `e` is "join" or
+    "leave", `gd` is the guild id and `g` is the shrine number for leaves.
+    Records written before guild ids were logged belong to `default_guild_id`.
+    `record` only updates the in-memory (guild, user) index and hands the line
+    to the writer thread, so handlers never block on the file. The file
+    rotates to `<path>.1` ... `<path>.<backup_count>` once it passes
+    `max_bytes`, or once its first timestamped record is `max_age` seconds
+    old (so restarts don't reset the clock).
+    """
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, max_age=7 * 24 * 3600, backup_count=10, default_guild_id=0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.default_guild_id = default_guild_id
+
+        self._index = {}  # (guild id, user id) -> list of (timestamp, event, name, gumball)
+        self._started_at = None  # timestamp of the current file's first timestamped record
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    # ------------------------------------------------------------------ startup
+
+    def load(self, legacy_path=None):
+        """Builds the per-member index from existing files and starts the writer thread.
+
+        When no structured log exists yet and `legacy_path` does, its lines are
+        imported first. The writer starts even if reading fails, so new events
+        are still written.
+        """
+        try:
+            if legacy_path and not os.path.exists(self.path) and os.path.exists(legacy_path):
+                imported = import_legacy_log(legacy_path, self.path, self.default_guild_id)
+                logging.info(f"📦 Imported {imported} events from {legacy_path} into {self.path}.")
+
+            for path in self._files_oldest_first():
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            self._add_to_index(record)
+                        except (ValueError, KeyError):
+                            logging.warning(f"⚠️ Skipping malformed event line in {path}: {line.strip()}")
+                            continue
+                        if path == self.path and self._started_at is None:
+                            self._started_at = record.get("t")
+            logging.info(f"📒 Member event log loaded: {len(self._index)} members indexed.")
+        except (OSError, ValueError) as e:
+            logging.error(f"❌ Failed to load member events, history will be incomplete: {e}")
+        finally:
+            self._thread = threading.Thread(target=self._writer, name="member-event-log", daemon=True)
+            self._thread.start()
+
+    def _files_oldest_first(self):
+        backups = [f"{self.path}.{i}" for i in range(self.backup_count, 0, -1)]
+        return [p for p in backups + [self.path] if os.path.exists(p)]
+
+    def _add_to_index(self, record):
+        entry = (record.get("t"), record["e"], record["n"], record.get("g"))
+        key = (record.get("gd", self.default_guild_id), record["id"])
+        self._index.setdefault(key, []).append(entry)
+
+    # ------------------------------------------------------------------ writes
+
+    def record(self, event, guild_id, user_id, name, gumball=None):
+        """Logs a "join" or "leave" in one guild without blocking."""
+        record = {"t": round(time.time(), 3), "e": event, "gd": guild_id, "id": user_id, "n": name}
+        if gumball is not None:
+            record["g"] = gumball
+        self._add_to_index(record)
+        self._queue.put(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+    def _writer(self):
+        f = open(self.path, "a", encoding="utf-8")
+        started_at = self._started_at or time.time()
+        while True:
+            lines = [self._queue.get()]
+            # Drain whatever else is waiting so a burst costs one write and flush
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = _STOP in lines
+            lines = [line for line in lines if line is not _STOP]
+            if lines:
+                try:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                except OSError as e:
+                    logging.error(f"❌ Failed to write member events: {e}")
+
+            if stop:
+                f.close()
+                return
+
+            if f.tell() >= self.max_bytes or time.time() - started_at >= self.max_age:
+                f.close()
+                self._rotate()
+                f = open(self.path, "a", encoding="utf-8")
+                started_at = time.time()
+
+    def _rotate(self):
+        try:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        except OSError as e:
+            logging.error(f"❌ Failed to rotate {self.path}: {e}")
+
+    def close(self):
+        """Writes any queued records and stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    # ------------------------------------------------------------------ queries
+
+    def history(self, guild_id, user_id):
+        """Returns a user's events in one guild, oldest first, as (timestamp, event, name, gumball) tuples."""
+        return list(self._index.get((guild_id, user_id), ()))
+
+    def counts(self, guild_id, user_id):
+        """Returns (joins, leaves) for a user in one guild."""
+        events = self._index.get((guild_id, user_id), ())
+        joins = sum(1 for e in events if e[1] == "join")
+        return joins, len(events) - joins
+
+
+def import_legacy_log(legacy_path, output_path, guild_id=None):
+    """Converts emoji-prefixed joins_leaves.log lines into JSONL records. Returns the number imported.
+
+    The legacy log came from a single server; pass its `guild_id` to tag the records.
+    """
+    imported = 0
+    with open(legacy_path, "r", encoding="utf-8") as src, open(output_path, "a", encoding="utf-8") as dst:
+        for line in src:
+            match = LEGACY_LINE.match(line)
+            if not match:
+                if line.strip():
+                    logging.warning(f"⚠️ Unrecognized legacy log line: {line.strip()}")
+                continue
+            record = {
+                "t": None,
+                "e": "join" if match["action"] == "joined" else "leave",
+                "id": int(match["id"]),
+                "n": match["name"],
+            }
+            if guild_id is not None:
+                record["gd"] = guild_id
+            if match["gumball"]:
+                record["g"] = int(match["gumball"])
+            dst.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    # One-off import: python event_log.py joins_leaves.log member_events.jsonl [guild_id]
+    if len(sys.argv) not in (3, 4):
+        sys.exit("usage: python event_log.py <legacy_log> <output_jsonl> [guild_id]")
+    guild_id = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    print(f"Imported {import_legacy_log(sys.argv[1], sys.argv[2], guild_id)} events.")
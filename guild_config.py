@@ -0,0 +1,100 @@
+import json
+import logging
+
+# Per-guild channel and role settings, keyed by guild id
+GUILD_CONFIG_FILE = "guild_configs.json"
+
+
+class GuildConfig:
+    """Channel and role ids for one server.
+
+    Config keys (all but `general_channel` optional)::
+
+        {
+            "name": "The Cosmic Gumball Machine",
+            "general_channel": 1336212816415424513,
+            "welcome_channel": 1336547290298581065,
+            "verify_human_channel": 1336547466799222814,
+            "verify_gumball_channel": 1336547518288498698,
+            "verify_traits_channel": 1336547704037314631,
+            "shrine_channel": 1339853650650206292,
+            "verified_role": 1339113346229862460,
+            "fire_role_name": "ON FIRE 🔥"
+        }
+
+    `name` is used in join, welcome and leave messages (the Discord server
+    name when missing). Missing channels simply switch the matching feature
+    off for that server.
+    """
+
+    __slots__ = (
+        "guild_id", "name", "general_channel_id", "welcome_channel_id", "verify_human_channel_id",
+        "verify_gumball_channel_id", "verify_traits_channel_id", "shrine_channel_id", "verified_role_id",
+        "fire_role_name",
+    )
+
+    def __init__(self, guild_id, config):
+        self.guild_id = int(guild_id)
+        self.name = config.get("name")
+        self.general_channel_id = _optional_id(config, "general_channel")
+        self.welcome_channel_id = _optional_id(config, "welcome_channel")
+        self.verify_human_channel_id = _optional_id(config, "verify_human_channel")
+        self.verify_gumball_channel_id = _optional_id(config, "verify_gumball_channel")
+        self.verify_traits_channel_id = _optional_id(config, "verify_traits_channel")
+        self.shrine_channel_id = _optional_id(config, "shrine_channel")
+        self.verified_role_id = _optional_id(config, "verified_role")
+        self.fire_role_name = config.get("fire_role_name")
+
+    def channel_ids(self):
+        return [
+            channel_id for channel_id in (
+                self.general_channel_id, self.welcome_channel_id, self.verify_human_channel_id,
+                self.verify_gumball_channel_id, self.verify_traits_channel_id, self.shrine_channel_id,
+            ) if channel_id
+        ]
+
+
+def _optional_id(config, key):
+    value = config.get(key)
+    return int(value) if value else None
+
+
+class GuildConfigStore:
+    """Every configured server's `GuildConfig`, looked up by guild id in O(1).
+
+    Read from `path` ({"guilds": {"<guild id>": {...}}}). When the file is
+    missing, `default` ({guild id: config}) is used, which keeps a
+    single-server deployment working without any extra file.
+    """
+
+    def __init__(self, path=GUILD_CONFIG_FILE, default=None):
+        self.path = path
+        self.default = default or {}
+        self._configs = {}
+
+    def __len__(self):
+        return len(self._configs)
+
+    def __contains__(self, guild_id):
+        return guild_id in self._configs
+
+    def __iter__(self):
+        return iter(self._configs.values())
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                guilds = json.load(f)["guilds"]
+        except FileNotFoundError:
+            guilds = self.default
+        except (ValueError, KeyError, OSError) as e:
+            logging.error(f"❌ Failed to load guild configs from {self.path}: {e}")
+            guilds = self.default
+
+        self._configs = {int(guild_id): GuildConfig(guild_id, config) for guild_id, config in guilds.items()}
+        logging.info(f"🏠 Loaded configuration for {len(self._configs)} guild(s).")
+        return len(self._configs)
+
+    def get(self, guild_id):
+        """Returns the guild's config, or None for servers that aren't configured."""
+        return self._configs.get(guild_id)
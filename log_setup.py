@@ -0,0 +1,98 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# Subsystem loggers. Levels come from LOG_LEVELS, e.g. "chat=WARNING,relay=DEBUG",
+# and sampling from LOG_SAMPLE, e.g. "chat=0.05" (keep 5% of chat records).
+SUBSYSTEMS = ("chat", "relay")
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message in the caller (the event loop);
+    here the record goes onto the queue as-is, so `%`-style arguments are
+    only interpolated by the listener, off the loop.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Tracebacks hold frames; render them now while they are still valid
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Passes roughly `rate` of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def _parse_pairs(value):
+    pairs = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, setting = item.partition("=")
+        pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def get_logger(subsystem):
+    """Returns the logger for a subsystem, e.g. get_logger("relay") -> "gumball.relay"."""
+    return logging.getLogger(f"gumball.{subsystem}")
+
+
+def setup_logging(level=None, levels=None, samples=None):
+    """Routes all logging through a queue to a background listener thread.
+
+    Safe to call more than once; only the first call configures handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root.handlers[:] = [DeferredQueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    levels = _parse_pairs(os.getenv("LOG_LEVELS", "")) if levels is None else levels
+    samples = _parse_pairs(os.getenv("LOG_SAMPLE", "")) if samples is None else samples
+    for subsystem in SUBSYSTEMS:
+        logger = get_logger(subsystem)
+        if subsystem in levels:
+            logger.setLevel(levels[subsystem].upper())
+        if subsystem in samples:
+            logger.addFilter(SamplingFilter(float(samples[subsystem])))
+
+
+def setup_worker_logging():
+    """Gives a pool worker process its own stream handler.
+
+    A worker shouldn't route records through a queue it may not drain (a
+    fork copies the queue handler but not the listener thread), and worker
+    logging is occasional (one line per render, plus errors), so it writes
+    directly.
+    """
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    logging.getLogger().handlers[:] = [stream]
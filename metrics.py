@@ -0,0 +1,195 @@
+import asyncio
+import bisect
+import functools
+import json
+import logging
+import os
+import time
+
+# Histogram bucket upper bounds in seconds (roughly x2 steps from 0.1 ms to ~100 s)
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Latency histograms for handlers, rendering and sends, plus event-loop lag.
+
+    Controlled by METRICS_ENABLED. When disabled, `instrument` returns the
+    handler unchanged, `timer` returns a shared no-op context manager and
+    `observe` returns immediately, so instrumentation costs next to nothing.
+    The shared instance is created at import time, so call `configure` once
+    `.env` is loaded and before any handler is decorated.
+    """
+
+    def __init__(self, enabled=None):
+        self.histograms = {}
+        self.started = time.time()
+        self._server = None
+        self.configure(enabled)
+
+    def configure(self, enabled=None):
+        """Turns metrics on or off (None reads METRICS_ENABLED from the environment)."""
+        if enabled is None:
+            enabled = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+        self.enabled = enabled
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self._histogram(name).observe(seconds)
+
+    def timer(self, name):
+        """Context manager recording the wrapped block's duration under `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._histogram(name))
+
+    def instrument(self, name):
+        """Decorator timing an async function (e.g. an event handler) under `name`."""
+        def decorator(func):
+            if not self.enabled:
+                return func
+            histogram = self._histogram(name)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    async def monitor_loop_lag(self, interval=0.5):
+        """Measures how late the event loop wakes up from a sleep of `interval` seconds."""
+        if not self.enabled:
+            return
+        histogram = self._histogram("event_loop_lag")
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            histogram.observe(max(0.0, loop.time() - start - interval))
+
+    def snapshot(self):
+        return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    # ------------------------------------------------------------------ export
+
+    def prometheus_text(self):
+        lines = []
+        for name, h in sorted(self.histograms.items()):
+            metric = f"gumball_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+            lines.append(f"{metric}_sum {h.total}")
+            lines.append(f"{metric}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=9108):
+        """Serves /metrics (Prometheus text) and /metrics.json on a local port."""
+        self._server = await asyncio.start_server(self._handle_http, host, port)
+        logging.info(f"📈 Metrics endpoint listening on http://{host}:{port}/metrics")
+
+    async def _handle_http(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # skip headers
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+
+            if path == "/metrics.json":
+                body, content_type, status = json.dumps(self.snapshot()), "application/json", "200 OK"
+            elif path == "/metrics":
+                body, content_type, status = self.prometheus_text(), "text/plain; version=0.0.4", "200 OK"
+            else:
+                body, content_type, status = "not found\n", "text/plain", "404 Not Found"
+
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+# Shared instance, imported by the modules that record timings
+metrics = Metrics()
@@ -1,25 +1,439 @@
 import discord
 from discord.ext import commands
+import asyncio
+import json
 import logging
+import os
+import time
+from collections import deque
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from metrics import metrics
+
+log = logging.getLogger("gumball.relay")
 
 # Mint feed relay channel IDs
 MINT_FEED_CHANNEL_ID = 1335990324039909529  # Mint feed server
 RELAY_CHANNEL_ID = 1336212729849188395  # Cosmic Gumball server
 
-async def relay_mint_message(message, bot):
-    """Relays messages from the mint feed server to the Cosmic Gumball server."""
-    
-    # Log every message the bot sees
-    logging.info(f"🔍 Checking message from server: {message.guild.name}, channel: {message.channel.name} ({message.channel.id}): {message.content}")
-
-    if message.channel.id == MINT_FEED_CHANNEL_ID:
-        relay_channel = bot.get_channel(RELAY_CHANNEL_ID)
-        if relay_channel:
-            logging.info(f"✅ Relaying message to {relay_channel.guild.name} ({relay_channel.name}): {message.content}")
-            await relay_channel.send(f"🟣 **New Mint!** {message.content}")
-        else:
-            logging.error(f"❌ Could not find relay channel {RELAY_CHANNEL_ID}")
-    else:
-        logging.info(f"❌ Ignoring message from unrelated channel ({message.channel.id})")
\ No newline at end of file
+# Routing table: which source channels relay to which target channels
+RELAY_ROUTES_FILE = "relay_routes.json"
+
+# Last relayed message id and recent ids per source, so restarts neither drop nor repeat mints
+MINT_RELAY_STATE_FILE = "mint_relay_state.json"
+
+# Discord allows at most 10 embeds per message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+# Deliveries that fail are retried after a short delay, up to this many attempts in total
+MAX_RELAY_ATTEMPTS = 3
+RELAY_RETRY_SECONDS = 30
+
+
+class RelayRoute:
+    """One source channel relayed to a list of target channels.
+
+    Config keys (all but `source` and `targets` optional)::
+
+        {
+            "name": "cosmic-gumball",
+            "source": 1335990324039909529,
+            "targets": [1336212729849188395],
+            "filter": {"webhook_only": true, "require_embed": true, "title_contains": ["gumball"]},
+            "format": {"content": "🟣 **New Mint!**", "color": 10181046}
+        }
+
+    `title_contains` matches case-insensitively against embed titles and
+    descriptions. `format.content` is sent above the relayed embeds and
+    `format.color` recolors them.
+    """
+
+    def __init__(self, config):
+        self.source_id = int(config["source"])
+        self.targets = [int(t) for t in config["targets"]]
+        self.name = config.get("name", str(self.source_id))
+
+        filters = config.get("filter", {})
+        self.webhook_only = filters.get("webhook_only", False)
+        self.require_embed = filters.get("require_embed", True)
+        self.title_contains = [t.casefold() for t in filters.get("title_contains", [])]
+
+        formatting = config.get("format", {})
+        self.content = formatting.get("content")
+        self.color = formatting.get("color")
+
+        # Throughput counters
+        self.started = time.monotonic()
+        self.matched = 0
+        self.filtered = 0
+        self.sent = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def accepts(self, message):
+        if self.webhook_only and message.webhook_id is None:
+            return False
+        if self.require_embed and not message.embeds:
+            return False
+        if self.title_contains:
+            text = " ".join(f"{e.title or ''} {e.description or ''}" for e in message.embeds).casefold()
+            if not any(term in text for term in self.title_contains):
+                return False
+        return True
+
+    def render(self, message):
+        """Returns the list of send() kwargs that relay `message` on this route."""
+        embeds = message.embeds
+        if self.color is not None:
+            embeds = [discord.Embed.from_dict({**e.to_dict(), "color": self.color}) for e in embeds]
+
+        chunks = [embeds[i:i + MAX_EMBEDS_PER_MESSAGE] for i in range(0, len(embeds), MAX_EMBEDS_PER_MESSAGE)]
+        if not chunks:
+            return [{"content": self.content or message.content}] if (self.content or message.content) else []
+
+        sends = [{"embeds": chunk} for chunk in chunks]
+        if self.content:
+            sends[0]["content"] = self.content
+        return sends
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "name": self.name,
+            "source": self.source_id,
+            "targets": len(self.targets),
+            "matched": self.matched,
+            "filtered": self.filtered,
+            "sent": self.sent,
+            "failed": self.failed,
+            "per_minute": self.matched * 60 / elapsed,
+            "latency_avg": self.latency_total / self.sent if self.sent else 0.0,
+            "latency_max": self.latency_max,
+        }
+
+
+class MintRelay:
+    """Relays one source channel's messages to its routes, in order and exactly once.
+
+    The id of the last relayed message (the high-water mark) is persisted by
+    the router, so `catch_up` can page through whatever was posted while the
+    bot was offline before live relaying resumes. Live messages wait until
+    the feed has caught up (a new gateway session pauses it again), so they
+    can never move the high-water mark past messages catch-up hasn't seen.
+    A bounded set of recently relayed ids guards against relaying a message
+    twice when catch-up and live events overlap.
+
+    A message stays in the persisted retry list from the moment its sends are
+    queued until every target confirms delivery. Targets that failed are
+    re-sent RELAY_RETRY_SECONDS later by the feed's retry timer, up to
+    MAX_RELAY_ATTEMPTS. Those still in flight when the bot stopped are re-sent
+    by the next `catch_up`.
+    """
+
+    def __init__(self, bot, outbound, source_id, routes, on_change, recent_size=1000):
+        self.bot = bot
+        self.outbound = outbound
+        self.source_id = source_id
+        self.routes = routes
+        self._on_change = on_change
+
+        self.last_id = None
+        self._recent = deque(maxlen=recent_size)
+        self._recent_set = set()
+        self._lock = asyncio.Lock()
+        self._caught_up = asyncio.Event()  # cleared until catch_up finishes
+        self._retry = {}  # message id -> {"targets": [channel ids not yet delivered], "attempts": n}
+        self._inflight = set()
+        self._retry_task = None
+
+    def restore(self, state):
+        self.last_id = state.get("last_id")
+        for message_id in state.get("recent_ids", []):
+            self._remember(message_id)
+        self._retry = {int(message_id): entry for message_id, entry in state.get("retry", {}).items()}
+
+    def state(self):
+        return {
+            "last_id": self.last_id,
+            "recent_ids": list(self._recent),
+            "retry": {str(message_id): entry for message_id, entry in self._retry.items()},
+        }
+
+    def _remember(self, message_id):
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_set.discard(self._recent[0])
+        self._recent.append(message_id)
+        self._recent_set.add(message_id)
+
+    def _mark_relayed(self, message_id):
+        self._remember(message_id)
+        if self.last_id is None or message_id > self.last_id:
+            self.last_id = message_id
+        self._on_change()
+
+    # ------------------------------------------------------------------ relaying
+
+    def pause(self):
+        """Holds live relays until the next `catch_up` (e.g. after a new gateway session)."""
+        self._caught_up.clear()
+
+    async def on_message(self, message):
+        """Relays a message once the feed has caught up (waits for catch-up, keeping order).
+
+        Returns True if it was sent, False if it was already relayed or no route accepts it.
+        """
+        await self._caught_up.wait()
+        async with self._lock:
+            return self._relay(message)
+
+    def _relay(self, message, targets=None):
+        """Queues `message` on every route that accepts it. Returns True if anything was sent.
+
+        `targets` limits a retry to the channels that didn't receive it last time.
+        """
+        retrying = targets is not None
+        if not retrying and (
+            message.id in self._recent_set
+            or message.id in self._retry
+            or (self.last_id is not None and message.id <= self.last_id)
+        ):
+            return False
+
+        deliveries = []  # (route, target id, future or None when the channel is missing)
+        for route in self.routes:
+            if not route.accepts(message):
+                if not retrying:
+                    route.filtered += 1
+                continue
+
+            sends = route.render(message)
+            for target_id in route.targets:
+                if retrying and target_id not in targets:
+                    continue
+                channel = self.bot.get_channel(target_id)
+                if not channel:
+                    log.error("❌ Relay target %s for route %s not found.", target_id, route.name)
+                    deliveries.append((route, target_id, None))
+                    continue
+                for kwargs in sends:
+                    deliveries.append((route, target_id, self.outbound.send(channel, coalesce=True, **kwargs)))
+            if not retrying:
+                route.matched += 1
+
+        if deliveries:
+            # Persisted as pending until every target confirms, so a crash or failure gets retried
+            entry = self._retry.setdefault(message.id, {"targets": [], "attempts": 0})
+            entry["targets"] = sorted({target_id for _, target_id, _ in deliveries})
+            entry["attempts"] += 1
+            self._inflight.add(message.id)
+            asyncio.get_running_loop().create_task(self._track(message.id, deliveries, message.created_at))
+
+        self._mark_relayed(message.id)
+        return bool(deliveries)
+
+    async def _track(self, message_id, deliveries, created_at):
+        """Waits for every target's delivery concurrently, records latency and settles the retry entry."""
+        futures = [future for _, _, future in deliveries if future is not None]
+        results = iter(await asyncio.gather(*futures, return_exceptions=True))
+        latency = time.time() - created_at.timestamp()
+        metrics.observe("relay_latency", latency)
+
+        failed_targets = set()
+        for route, target_id, future in deliveries:
+            result = next(results) if future is not None else None
+            if result is None or isinstance(result, BaseException):
+                route.failed += 1
+                failed_targets.add(target_id)
+            else:
+                route.sent += 1
+                route.latency_total += latency
+                route.latency_max = max(route.latency_max, latency)
+
+        self._inflight.discard(message_id)
+        entry = self._retry.get(message_id)
+        if entry is not None:
+            if not failed_targets:
+                del self._retry[message_id]
+            elif entry["attempts"] >= MAX_RELAY_ATTEMPTS:
+                del self._retry[message_id]
+                log.error("❌ Giving up on relaying message %s to %s after %d attempts.", message_id, sorted(failed_targets), entry["attempts"])
+            else:
+                entry["targets"] = sorted(failed_targets)
+                log.warning("⚠️ Relay of message %s to %s failed; retrying in %ds.", message_id, sorted(failed_targets), RELAY_RETRY_SECONDS)
+                self._schedule_retry()
+        self._on_change()
+
+    def _schedule_retry(self):
+        if self._retry_task is None or self._retry_task.done():
+            self._retry_task = asyncio.get_running_loop().create_task(self._retry_soon())
+
+    async def _retry_soon(self):
+        """Retry timer: re-sends failed deliveries until none are left waiting (in-flight ones re-arm it on failure)."""
+        while True:
+            await asyncio.sleep(RELAY_RETRY_SECONDS)
+            source = self.bot.get_channel(self.source_id)
+            if not source:
+                log.error("❌ Relay source channel %s not found, leaving retries to the next catch-up.", self.source_id)
+                return
+            async with self._lock:
+                await self._retry_failed(source)
+            if all(message_id in self._inflight for message_id in self._retry):
+                return
+
+    async def _retry_failed(self, source):
+        """Re-sends messages whose delivery failed (or was interrupted) to the targets that missed them."""
+        for message_id, entry in sorted(self._retry.items()):
+            if message_id in self._inflight:
+                continue
+            try:
+                message = await source.fetch_message(message_id)
+            except discord.NotFound:
+                log.warning("⚠️ Message %s was deleted before it could be relayed again.", message_id)
+                del self._retry[message_id]
+                self._on_change()
+                continue
+            except discord.HTTPException as e:
+                log.error("❌ Failed to fetch message %s for a relay retry: %s", message_id, e)
+                continue
+            self._relay(message, targets=set(entry["targets"]))
+
+    async def catch_up(self):
+        """Relays, oldest first, every message posted since the last relayed one, then resumes live relays.
+
+        Live relays resume even if catch-up fails, so a broken feed can't hold them forever.
+        """
+        try:
+            source = self.bot.get_channel(self.source_id)
+            if not source:
+                log.error("❌ Relay source channel %s not found, skipping catch-up.", self.source_id)
+                return 0
+
+            async with self._lock:
+                if self._retry:
+                    await self._retry_failed(source)
+
+                if self.last_id is None:
+                    # First run: start from the newest message instead of replaying the whole feed
+                    newest = await anext(source.history(limit=1), None)
+                    if newest:
+                        self._mark_relayed(newest.id)
+                    return 0
+
+                count = 0
+                # history() pages through the API 100 messages per request
+                async for message in source.history(limit=None, after=discord.Object(id=self.last_id), oldest_first=True):
+                    # Same rule as live messages: webhooks relay, other bots' posts don't
+                    if message.author.bot and message.webhook_id is None:
+                        continue
+                    self._relay(message)
+                    count += 1
+                if count:
+                    log.info("🟣 Caught up on %d missed messages from channel %s.", count, self.source_id)
+                return count
+        finally:
+            self._caught_up.set()
+
+
+class RelayRouter:
+    """Dispatches messages from any configured source channel to its routes.
+
+    Routes are read from `routes_path` (see `RelayRoute`). When the file is
+    missing or malformed, the single MINT_FEED_CHANNEL_ID -> RELAY_CHANNEL_ID
+    route is used.
+    """
+
+    def __init__(self, bot, outbound, routes_path=RELAY_ROUTES_FILE, state_path=MINT_RELAY_STATE_FILE):
+        self.bot = bot
+        self.outbound = outbound
+        self.routes_path = routes_path
+        self.state_path = state_path
+
+        self.routes = []
+        self.feeds = {}  # source channel id -> MintRelay
+        self._save_task = None
+        self._dirty = False
+
+    def load(self):
+        """Reads the routing table and each feed's saved high-water mark."""
+        default = [RelayRoute({"name": "mint-feed", "source": MINT_FEED_CHANNEL_ID, "targets": [RELAY_CHANNEL_ID]})]
+        try:
+            with open(self.routes_path, "r") as f:
+                config = json.load(f)
+            self.routes = [RelayRoute(route) for route in config["routes"]]
+        except FileNotFoundError:
+            self.routes = default
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            log.error("❌ Failed to load relay routes from %s, using the default mint feed route: %s", self.routes_path, e)
+            self.routes = default
+
+        by_source = {}
+        for route in self.routes:
+            by_source.setdefault(route.source_id, []).append(route)
+        self.feeds = {
+            source_id: MintRelay(self.bot, self.outbound, source_id, routes, self._request_save)
+            for source_id, routes in by_source.items()
+        }
+
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except (ValueError, OSError) as e:
+            log.error("❌ Failed to load relay state: %s", e)
+            state = {}
+        if "last_id" in state:
+            # State written before routing existed only tracked the mint feed
+            state = {str(MINT_FEED_CHANNEL_ID): state}
+        for source_id, feed in self.feeds.items():
+            feed.restore(state.get(str(source_id), {}))
+
+        log.info("🟣 Relay router loaded %d routes from %d source channels.", len(self.routes), len(self.feeds))
+
+    async def on_message(self, message):
+        """Relays `message` if its channel is a configured source (one dict lookup otherwise)."""
+        feed = self.feeds.get(message.channel.id)
+        if feed is not None:
+            await feed.on_message(message)
+
+    def pause(self):
+        """Holds live relays on every feed until the next `catch_up`."""
+        for feed in self.feeds.values():
+            feed.pause()
+
+    async def catch_up(self):
+        """Catches up every source channel concurrently; one failing feed doesn't stop the others."""
+        results = await asyncio.gather(*(feed.catch_up() for feed in self.feeds.values()), return_exceptions=True)
+        count = 0
+        for source_id, result in zip(self.feeds, results):
+            if isinstance(result, BaseException):
+                log.error("❌ Catch-up failed for relay source %s: %s", source_id, result)
+            else:
+                count += result
+        return count
+
+    def stats(self):
+        return [route.stats() for route in self.routes]
+
+    # ------------------------------------------------------------------ state
+
+    def _request_save(self):
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.get_running_loop().create_task(self._save())
+
+    async def _save(self):
+        while self._dirty:
+            await asyncio.sleep(0.5)  # one write per burst of relays
+            self._dirty = False
+            state = {str(source_id): feed.state() for source_id, feed in self.feeds.items()}
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write_state, state)
+            except OSError as e:
+                log.error("❌ Failed to save relay state: %s", e)
+
+    def _write_state(self, state):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
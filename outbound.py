@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+
+from metrics import metrics
+
+# Discord limits for a single message
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS = 10
+
+# Discord allows roughly 5 messages per 5 seconds per channel and 50 requests per second globally
+CHANNEL_RATE = (5, 5.0)
+GLOBAL_RATE = (50, 1.0)
+
+
+class RateBucket:
+    """Token bucket that waits before a request would hit a Discord rate limit."""
+
+    def __init__(self, capacity, per):
+        self.capacity = capacity
+        self.per = per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.per)
+        self.updated = now
+
+    async def acquire(self):
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) * self.per / self.capacity)
+            self._refill()
+        self.tokens -= 1
+
+    def penalize(self, retry_after):
+        """Empties the bucket so the next send waits at least `retry_after` seconds."""
+        self.tokens = -retry_after * self.capacity / self.per
+        self.updated = time.monotonic()
+
+
+class OutboundMessage:
+    __slots__ = ("content", "embeds", "file", "view", "coalesce", "future")
+
+    def __init__(self, content, embeds, file, view, coalesce, future):
+        self.content = content
+        self.embeds = embeds
+        self.file = file
+        self.view = view
+        self.coalesce = coalesce
+        self.future = future
+
+
+class ChannelStats:
+    __slots__ = ("queued", "sent", "messages", "coalesced", "dropped", "failed")
+
+    def __init__(self):
+        self.queued = 0
+        self.sent = 0  # API calls made
+        self.messages = 0  # messages handed to the dispatcher and delivered
+        self.coalesced = 0  # messages merged into another send
+        self.dropped = 0
+        self.failed = 0
+
+
+class OutboundDispatcher:
+    """Central outbound queue with one worker task per channel.
+
+    Handlers call `send` and return immediately. Each channel's worker waits
+    on a per-channel and a global token bucket before every API call, so
+    bursts queue up locally instead of tripping 429s. While a coalescable
+    message waits, later coalescable messages to the same channel are merged
+    into it (contents joined by newlines, embeds batched up to 10).
+    """
+
+    def __init__(self, linger=0.25, max_queue=500, channel_rate=CHANNEL_RATE, global_rate=GLOBAL_RATE):
+        self.linger = linger
+        self.max_queue = max_queue
+        self.channel_rate = channel_rate
+        self.global_bucket = RateBucket(*global_rate)
+
+        self._queues = {}
+        self._workers = {}
+        self._buckets = {}
+        self._stats = {}
+
+    def send(self, channel, content=None, *, embed=None, embeds=None, file=None, view=None, coalesce=False):
+        """Queues a message for `channel` and returns a future resolving to the sent message (or None)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        channel_id = channel.id
+
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = asyncio.Queue(maxsize=self.max_queue)
+            self._buckets[channel_id] = RateBucket(*self.channel_rate)
+            self._stats[channel_id] = ChannelStats()
+        stats = self._stats[channel_id]
+
+        all_embeds = list(embeds or ())
+        if embed is not None:
+            all_embeds.append(embed)
+        # Files and views are tied to a single message and cannot be merged
+        coalesce = coalesce and file is None and view is None
+
+        try:
+            queue.put_nowait(OutboundMessage(content, all_embeds, file, view, coalesce, future))
+        except asyncio.QueueFull:
+            stats.dropped += 1
+            logging.warning(f"⚠️ Outbound queue for channel {channel_id} is full, dropping message.")
+            future.set_result(None)
+            return future
+
+        stats.queued += 1
+        worker = self._workers.get(channel_id)
+        if worker is None or worker.done():
+            self._workers[channel_id] = loop.create_task(self._run(channel, queue, stats))
+        return future
+
+    @staticmethod
+    def _can_merge(content_len, embed_count, item):
+        if not item.coalesce:
+            return False
+        if embed_count + len(item.embeds) > MAX_EMBEDS:
+            return False
+        if item.content:
+            extra = len(item.content) + (1 if content_len else 0)
+            if content_len + extra > MAX_CONTENT_LENGTH:
+                return False
+        return True
+
+    async def _run(self, channel, queue, stats):
+        bucket = self._buckets[channel.id]
+        carry = None
+
+        while True:
+            item = carry if carry is not None else await queue.get()
+            carry = None
+            batch = [item]
+
+            if item.coalesce:
+                # Give closely spaced messages a moment to arrive, then merge what's queued
+                if self.linger:
+                    await asyncio.sleep(self.linger)
+                content_len = len(item.content or "")
+                embed_count = len(item.embeds)
+                while not queue.empty():
+                    nxt = queue.get_nowait()
+                    if not self._can_merge(content_len, embed_count, nxt):
+                        carry = nxt
+                        break
+                    batch.append(nxt)
+                    if nxt.content:
+                        content_len += len(nxt.content) + (1 if content_len else 0)
+                    embed_count += len(nxt.embeds)
+
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            await self._deliver(channel, batch, stats, bucket)
+
+            for _ in batch:
+                queue.task_done()
+                stats.queued -= 1
+
+    async def _deliver(self, channel, batch, stats, bucket):
+        first = batch[0]
+        contents = [m.content for m in batch if m.content]
+        embeds = [e for m in batch for e in m.embeds]
+
+        kwargs = {}
+        if contents:
+            kwargs["content"] = "\n".join(contents)
+        if embeds:
+            kwargs["embeds"] = embeds
+        if first.file is not None:
+            kwargs["file"] = first.file
+        if first.view is not None:
+            kwargs["view"] = first.view
+
+        try:
+            with metrics.timer("outbound_send"):
+                sent = await channel.send(**kwargs)
+        except Exception as e:
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                bucket.penalize(retry_after)
+            stats.failed += len(batch)
+            logging.error(f"❌ Failed to send queued message to channel {channel.id}: {e}")
+            sent = None
+        else:
+            stats.sent += 1
+            stats.messages += len(batch)
+            stats.coalesced += len(batch) - 1
+
+        for m in batch:
+            if not m.future.done():
+                m.future.set_result(sent)
+
+    def depth(self, channel_id=None):
+        """Returns the number of queued messages for one channel, or for all channels."""
+        if channel_id is not None:
+            stats = self._stats.get(channel_id)
+            return stats.queued if stats else 0
+        return sum(s.queued for s in self._stats.values())
+
+    def stats(self):
+        """Returns per-channel counters keyed by channel id."""
+        return {
+            channel_id: {name: getattr(s, name) for name in ChannelStats.__slots__}
+            for channel_id, s in self._stats.items()
+        }
+
+    async def drain(self):
+        """Waits until every queued message has been delivered."""
+        for queue in list(self._queues.values()):
+            await queue.join()
@@ -0,0 +1,179 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+
+
+class ScheduledJob:
+    __slots__ = ("run_at", "kind", "key", "payload", "cancelled")
+
+    def __init__(self, run_at, kind, key, payload):
+        self.run_at = run_at
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.cancelled = False
+
+
+class JobScheduler:
+    """Runs delayed jobs from one persisted min-heap and a single timer task.
+
+    Jobs have a `kind`, a JSON-serializable `payload` and a unique `key`;
+    scheduling a key that is already pending replaces it. Handlers are
+    registered per kind with `register(kind, handler, group_by=...)`. When
+    jobs come due together they are grouped by `payload[group_by]` (e.g. guild
+    id) and each group is handed to the handler as one list, so a handler can
+    share lookups and API calls across the batch.
+
+    Pending jobs are written to `path` whenever the set changes and reloaded
+    by `load`, so nothing is lost across a restart; jobs that came due while
+    offline run as soon as the scheduler starts.
+    """
+
+    def __init__(self, path, batch_window=1.0):
+        self.path = path
+        self.batch_window = batch_window
+
+        self._heap = []
+        self._jobs = {}  # key -> ScheduledJob
+        self._handlers = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._save_task = None
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, key):
+        return key in self._jobs
+
+    def register(self, kind, handler, group_by=None):
+        """Registers `async handler(payloads)` for jobs of `kind`."""
+        self._handlers[kind] = (handler, group_by)
+
+    # ------------------------------------------------------------------ scheduling
+
+    def schedule(self, kind, key, delay, payload):
+        """Schedules (or reschedules) job `key` to run `delay` seconds from now."""
+        self._push(ScheduledJob(time.time() + delay, kind, key, payload))
+        self._request_save()
+
+    def cancel(self, key):
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job.cancelled = True
+            self._request_save()
+
+    def _push(self, job):
+        old = self._jobs.get(job.key)
+        if old is not None:
+            old.cancelled = True
+        self._jobs[job.key] = job
+        heapq.heappush(self._heap, (job.run_at, next(self._counter), job))
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------ persistence
+
+    def load(self):
+        """Reloads pending jobs saved by a previous run. Returns how many were loaded."""
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (ValueError, OSError) as e:
+            logging.error(f"❌ Failed to load scheduled jobs: {e}")
+            return 0
+
+        for item in saved:
+            self._push(ScheduledJob(item["run_at"], item["kind"], item["key"], item["payload"]))
+        logging.info(f"⏰ Loaded {len(self._jobs)} scheduled jobs.")
+        return len(self._jobs)
+
+    def save(self):
+        self._write(self.path, self._saved_data())
+
+    def _saved_data(self):
+        return [
+            {"run_at": job.run_at, "kind": job.kind, "key": job.key, "payload": job.payload}
+            for job in self._jobs.values()
+        ]
+
+    @staticmethod
+    def _write(path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _request_save(self):
+        # Coalesce saves: one writer task, which loops while changes keep arriving
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.get_running_loop().create_task(self._save_soon())
+
+    async def _save_soon(self):
+        while self._dirty:
+            await asyncio.sleep(0)
+            self._dirty = False
+            data = self._saved_data()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, self.path, data)
+            except OSError as e:
+                logging.error(f"❌ Failed to save scheduled jobs: {e}")
+
+    # ------------------------------------------------------------------ timer
+
+    async def run(self):
+        """Timer loop: sleeps until the next job is due, then runs every due job in batches."""
+        while True:
+            self._wakeup.clear()
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue  # an earlier job arrived
+                except asyncio.TimeoutError:
+                    pass
+
+            # Collect everything due now (plus a short window so neighbours share a batch)
+            cutoff = time.time() + self.batch_window
+            due = []
+            while self._heap and self._heap[0][0] <= cutoff:
+                _, _, job = heapq.heappop(self._heap)
+                if not job.cancelled:
+                    due.append(job)
+                    del self._jobs[job.key]
+
+            if due:
+                await self._dispatch(due)
+                self._request_save()
+
+    async def _dispatch(self, jobs):
+        groups = {}
+        for job in jobs:
+            handler, group_by = self._handlers.get(job.kind, (None, None))
+            if handler is None:
+                logging.error(f"❌ No handler registered for scheduled job kind '{job.kind}'.")
+                continue
+            group = job.payload.get(group_by) if group_by else None
+            groups.setdefault((job.kind, group), []).append(job.payload)
+
+        for (kind, _), payloads in groups.items():
+            handler, _ = self._handlers[kind]
+            try:
+                await handler(payloads)
+            except Exception as e:
+                logging.error(f"❌ Scheduled job batch '{kind}' failed: {e}")
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shrine (
+    guild_id INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    enshrined_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, number)
+);
+CREATE INDEX IF NOT EXISTS shrine_guild_user ON shrine (guild_id, user_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class ShrineStore:
+    """Durable record of every enshrined gumball, backed by SQLite in WAL mode.
+
+    Each guild numbers its gumballs independently. `enshrine` hands out the
+    next number immediately from an in-memory per-guild counter and queues
+    the row. Queued rows are written as one transaction on
+    a dedicated writer thread every `flush_interval` seconds (or sooner once
+    `batch_size` rows are waiting), so the event loop never touches the disk.
+
+    The count left behind by the old `gumball_shrine.json` is imported once as
+    `base_count` for `default_guild_id`, so numbering continues where the
+    JSON file stopped. Databases from before per-guild numbering are migrated
+    into `default_guild_id` as well.
+
+    If the database never opened, `enshrine` returns None rather than a number
+    from an empty counter, and writes and queries do nothing.
+    """
+
+    def __init__(self, path, legacy_file=None, default_guild_id=0, flush_interval=0.5, batch_size=100):
+        self.path = path
+        self.legacy_file = legacy_file
+        self.default_guild_id = default_guild_id
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self.counts = {}  # guild id -> last gumball number
+        self.opened = False  # set once the database is open and the counters are rebuilt
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shrine-store")
+        self._pending = []
+        self._flush_task = None
+
+    # ------------------------------------------------------------------ startup
+
+    def load(self):
+        """Opens the database and rebuilds the counter (blocking; call before the loop is busy)."""
+        self._executor.submit(self._open).result()
+        total = sum(self.counts.values())
+        logging.info(f"🌌 Shrine store loaded: {total} gumballs enshrined across {len(self.counts)} guild(s).")
+        return total
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate_single_guild()
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'base_count'").fetchone()
+        if row is None:
+            base_count = self._read_legacy_count()
+            with self._conn:
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('base_count', ?)", (str(base_count),))
+        else:
+            base_count = int(row[0])
+
+        self.counts = dict(self._conn.execute("SELECT guild_id, MAX(number) FROM shrine GROUP BY guild_id"))
+        if base_count:
+            self.counts[self.default_guild_id] = max(base_count, self.counts.get(self.default_guild_id, 0))
+        self.opened = True
+
+    def _migrate_single_guild(self):
+        """Moves rows from the old single-guild table (numbered by `number` alone) into `default_guild_id`."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(shrine)")]
+        if columns and "guild_id" not in columns:
+            self._conn.execute("ALTER TABLE shrine RENAME TO shrine_single_guild")
+            self._conn.execute("DROP INDEX IF EXISTS shrine_user_id")
+        self._conn.executescript(SCHEMA)
+
+        # Also resumes a migration that was interrupted after the rename
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'shrine_single_guild'").fetchone():
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO shrine (guild_id, number, user_id, name, enshrined_at) "
+                    "SELECT ?, number, user_id, name, enshrined_at FROM shrine_single_guild",
+                    (self.default_guild_id,),
+                )
+                self._conn.execute("DROP TABLE shrine_single_guild")
+            logging.info(f"📦 Migrated shrine records to per-guild numbering (guild {self.default_guild_id}).")
+
+    def _read_legacy_count(self):
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return 0
+        try:
+            with open(self.legacy_file, "r") as f:
+                count = int(json.load(f).get("count", 0))
+            logging.info(f"📦 Imported shrine count {count} from {self.legacy_file}.")
+            return count
+        except (ValueError, AttributeError, json.JSONDecodeError) as e:
+            logging.error(f"❌ Failed to import legacy shrine data: {e}")
+            return 0
+
+    # ------------------------------------------------------------------ writes
+
+    def count(self, guild_id):
+        """Returns how many gumballs a guild has enshrined."""
+        return self.counts.get(guild_id, 0)
+
+    def enshrine(self, guild_id, user_id, name):
+        """Assigns the guild's next gumball number to a departed member and queues the record.
+
+        Returns None when the store isn't open, since the counter can't be trusted.
+        """
+        if not self.opened:
+            logging.error(f"❌ Shrine store is not open, not enshrining {name} in guild {guild_id}.")
+            return None
+        number = self.counts[guild_id] = self.counts.get(guild_id, 0) + 1
+        self._pending.append((guild_id, number, user_id, name, time.time()))
+
+        loop = asyncio.get_running_loop()
+        if len(self._pending) >= self.batch_size:
+            loop.create_task(self.flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._delayed_flush())
+        return number
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Commits every queued record in a single transaction."""
+        if not self.opened or not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._write_batch, batch)
+        except Exception as e:
+            logging.error(f"❌ Failed to write {len(batch)} shrine records: {e}")
+            self._pending[:0] = batch
+            # Retry on the timer rather than waiting for the next leave (this may be that timer's own task)
+            if self._flush_task is None or self._flush_task.done() or self._flush_task is asyncio.current_task():
+                self._flush_task = loop.create_task(self._delayed_flush())
+
+    def _write_batch(self, batch):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO shrine (guild_id, number, user_id, name, enshrined_at) VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+
+    # ------------------------------------------------------------------ queries
+
+    async def _query(self, sql, params=()):
+        if not self.opened:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self._conn.execute(sql, params).fetchall())
+
+    async def get(self, guild_id, number):
+        """Returns (number, user_id, name, enshrined_at) for one of a guild's gumballs, or None."""
+        await self.flush()
+        rows = await self._query(
+            "SELECT number, user_id, name, enshrined_at FROM shrine WHERE guild_id = ? AND number = ?",
+            (guild_id, number),
+        )
+        return rows[0] if rows else None
+
+    async def recent(self, guild_id, limit=5):
+        """Returns a guild's most recently enshrined gumballs, newest first."""
+        await self.flush()
+        return await self._query(
+            "SELECT number, user_id, name, enshrined_at FROM shrine WHERE guild_id = ? ORDER BY number DESC LIMIT ?",
+            (guild_id, limit),
+        )
+
+    async def for_user(self, guild_id, user_id):
+        """Returns every gumball a user has become in a guild, oldest first."""
+        await self.flush()
+        return await self._query(
+            "SELECT number, user_id, name, enshrined_at FROM shrine WHERE guild_id = ? AND user_id = ? ORDER BY number",
+            (guild_id, user_id),
+        )
+
+    async def close(self):
+        """Commits queued records and closes the database (only if it was opened)."""
+        if self.opened:
+            await self.flush()
+            self.opened = False
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.close)
+        self._executor.shutdown(wait=True)
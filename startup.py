@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+# Reference point for every startup timing; bot.py imports this module first
+PROCESS_START = time.perf_counter()
+
+
+class StartupTimer:
+    """Records when each startup phase began and how long it took.
+
+    Phases overlap (state loading runs alongside the gateway login), so the
+    report lists each phase's start offset and duration relative to process
+    start instead of adding them up. `ready` closes the books and records
+    time-to-ready as the `time_to_ready` metric.
+    """
+
+    def __init__(self, started=PROCESS_START):
+        self.started = started
+        self.phases = {}  # name -> (start offset, duration) in seconds
+        self.ready_at = None
+
+    def record(self, name, start, end):
+        self.phases[name] = (start - self.started, end - start)
+
+    def mark(self, name):
+        """Records a phase that ran from process start until now (e.g. imports)."""
+        self.record(name, self.started, time.perf_counter())
+
+    @contextmanager
+    def phase(self, name):
+        """Times the wrapped block (which may await) as phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    async def run(self, name, func, *args):
+        """Runs blocking `func(*args)` on the default executor, timed as phase `name`."""
+        with self.phase(name):
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def ready(self):
+        """Marks the bot ready (first call only) and logs the breakdown."""
+        if self.ready_at is not None:
+            return False
+        self.ready_at = time.perf_counter() - self.started
+        metrics.observe("time_to_ready", self.ready_at)
+        breakdown = ", ".join(f"{name} {duration * 1000:.0f} ms" for name, (_, duration) in self.report())
+        logging.info(f"🚀 Ready in {self.ready_at * 1000:.0f} ms: {breakdown}")
+        return True
+
+    def report(self):
+        """Returns [(name, (start offset, duration))] ordered by start."""
+        return sorted(self.phases.items(), key=lambda item: item[1][0])
+
+
+# Shared instance for the bot process
+startup_timer = StartupTimer()
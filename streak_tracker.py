@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+
+
+class Streak:
+    __slots__ = ("count", "last_seen")
+
+    def __init__(self, count, last_seen):
+        self.count = count
+        self.last_seen = last_seen
+
+
+def _key_to_str(key):
+    return ":".join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+def _key_from_str(value):
+    parts = value.split(":")
+    return tuple(map(int, parts)) if len(parts) > 1 else int(value)
+
+
+class StreakTracker:
+    """Per-member gumball streaks that expire once `window` seconds pass without a hit.
+
+    Streaks are keyed by whatever the caller passes as `key`: a user id, or a
+    (guild_id, user_id) tuple so each server keeps its own streaks.
+
+    Expiry is driven by a min-heap of (expires_at, key). Each hit pushes a
+    new heap item and older items for the same key are skipped when popped,
+    so expiring costs O(log n) per entry and nothing ever scans the whole
+    table. At most `max_entries` streaks are kept; past that the streak
+    closest to expiring is dropped first.
+    """
+
+    def __init__(self, window=600, max_entries=100_000):
+        self.window = window
+        self.max_entries = max_entries
+        self._streaks = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self._streaks)
+
+    def hit(self, key, now):
+        """Records a gumball mention at `now` (Unix seconds) and returns the member's streak count."""
+        self.expire(now)
+
+        streak = self._streaks.get(key)
+        if streak is None:
+            if len(self._streaks) >= self.max_entries:
+                self._evict_one()
+            streak = self._streaks[key] = Streak(0, now)
+
+        streak.count += 1
+        streak.last_seen = now
+        heapq.heappush(self._heap, (now + self.window, key))
+
+        # Stale heap items pile up for chatty users; rebuild once they dominate
+        if len(self._heap) > 2 * len(self._streaks) + 1024:
+            self._heap = [(s.last_seen + self.window, k) for k, s in self._streaks.items()]
+            heapq.heapify(self._heap)
+        return streak.count
+
+    def get(self, key):
+        streak = self._streaks.get(key)
+        return streak.count if streak else 0
+
+    def expire(self, now):
+        """Drops every streak whose window has passed. Returns how many were removed."""
+        removed = 0
+        heap = self._heap
+        while heap and heap[0][0] < now:
+            expires_at, key = heapq.heappop(heap)
+            streak = self._streaks.get(key)
+            if streak is not None and streak.last_seen + self.window == expires_at:
+                del self._streaks[key]
+                removed += 1
+        return removed
+
+    def _evict_one(self):
+        while self._heap:
+            expires_at, key = heapq.heappop(self._heap)
+            streak = self._streaks.get(key)
+            if streak is not None and streak.last_seen + self.window == expires_at:
+                del self._streaks[key]
+                return
+
+    # ------------------------------------------------------------------ persistence
+
+    def snapshot(self, path):
+        """Atomically writes live streaks to `path` as {key: [count, last_seen]}.
+
+        Tuple keys are written as "guild_id:user_id".
+        """
+        self._write_snapshot(path, self._snapshot_data())
+
+    def _snapshot_data(self):
+        return {_key_to_str(key): [s.count, s.last_seen] for key, s in self._streaks.items()}
+
+    @staticmethod
+    def _write_snapshot(path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def restore(self, path, now=None, legacy_guild_id=None):
+        """Loads streaks saved by `snapshot`, skipping ones that expired while offline.
+
+        With `legacy_guild_id`, plain user-id keys from single-guild snapshots
+        are restored as (legacy_guild_id, user_id).
+        """
+        now = time.time() if now is None else now
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (ValueError, OSError) as e:
+            logging.error(f"❌ Failed to restore gumball streaks: {e}")
+            return 0
+
+        for raw_key, (count, last_seen) in data.items():
+            if last_seen + self.window >= now:
+                key = _key_from_str(raw_key)
+                if legacy_guild_id is not None and isinstance(key, int):
+                    key = (legacy_guild_id, key)
+                self._streaks[key] = Streak(count, last_seen)
+                self._heap.append((last_seen + self.window, key))
+        heapq.heapify(self._heap)
+        return len(self._streaks)
+
+    async def run_snapshots(self, path, interval=60):
+        """Expires and snapshots streaks every `interval` seconds until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            self.expire(time.time())
+            # Copy on the loop, write on a worker thread
+            data = self._snapshot_data()
+            try:
+                await loop.run_in_executor(None, self._write_snapshot, path, data)
+            except OSError as e:
+                logging.error(f"❌ Failed to snapshot gumball streaks: {e}")
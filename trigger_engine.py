@@ -0,0 +1,104 @@
+import logging
+from collections import deque
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class TriggerAutomaton:
+    """Aho-Corasick automaton over casefolded terms.
+
+    `terms` maps a category to a list of terms. A term only matches as a whole
+    word; a trailing `*` lets it match as a word prefix instead (so
+    "gumball*" matches "gumball", "gumballs" and "gumball's", but not
+    "bubblegumball").
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # state -> list of (pattern length, category, term, prefix)
+        self.size = 0
+
+        for category, words in terms.items():
+            for word in words:
+                prefix = word.endswith("*")
+                folded = word.rstrip("*").casefold()
+                if folded:
+                    self._add(folded, (len(folded), category, word, prefix))
+                    self.size += 1
+        self._build_links()
+
+    def _add(self, pattern, output):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(output)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # Inherit outputs of the suffix state so every hit is reported in one pass
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Returns every whole-word hit in `text` as (category, term, start, end) over the casefolded text."""
+        folded = text.casefold()
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for length, category, term, prefix in out[state]:
+                    start = end - length
+                    if start and _is_word_char(folded[start - 1]):
+                        continue
+                    if not prefix and end < len(folded) and _is_word_char(folded[end]):
+                        continue
+                    hits.append((category, term, start, end))
+        return hits
+
+    def categories(self, text):
+        """Returns the set of categories with at least one hit in `text`."""
+        return {hit[0] for hit in self.find(text)}
+
+
+class TriggerEngine:
+    """Holds the current automaton and swaps in a rebuilt one on `reload`."""
+
+    def __init__(self, load_terms):
+        self._load_terms = load_terms
+        self.automaton = TriggerAutomaton(load_terms())
+
+    def reload(self):
+        """Rebuilds the automaton from the term source. Returns the number of terms."""
+        automaton = TriggerAutomaton(self._load_terms())
+        self.automaton = automaton  # single assignment, so matching never sees a half-built automaton
+        logging.info(f"🔁 Trigger engine reloaded with {automaton.size} terms.")
+        return automaton.size
+
+    def find(self, text):
+        return self.automaton.find(text)
+
+    def categories(self, text):
+        return self.automaton.categories(text)
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+from collections import deque
+
+from metrics import metrics
+from outbound import RateBucket
+
+# Member role changes share a per-guild Discord rate limit; stay under it locally
+ROLE_CHANGE_RATE = (10, 10.0)
+
+# Queued changes handled per worker pass (progress is logged between passes)
+BATCH_SIZE = 100
+
+
+class GuildVerification:
+    """One guild's verified-member index and its queue of pending role changes."""
+
+    __slots__ = (
+        "guild_id", "role_id", "verified", "desired", "urgent", "bulk", "futures", "bucket", "worker",
+        "applied", "skipped", "failed",
+    )
+
+    def __init__(self, guild_id, role_id, rate):
+        self.guild_id = guild_id
+        self.role_id = role_id
+        self.verified = set()  # member ids holding the verified role
+        self.desired = {}  # member id -> True (verify) / False (unverify), one entry per queued member
+        self.urgent = deque()  # button clicks, served before bulk work
+        self.bulk = deque()
+        self.futures = {}  # member id -> futures waiting on that member's change
+        self.bucket = RateBucket(*rate)
+        self.worker = None
+
+        self.applied = 0
+        self.skipped = 0  # already in the requested state (or gone), no API call made
+        self.failed = 0
+
+    @property
+    def pending(self):
+        return len(self.desired)
+
+
+class VerificationService:
+    """Verifies and unverifies members through a queued, rate-limited worker per guild.
+
+    An in-memory index of verified member ids per guild (built from the role's
+    members, then kept current from `on_member_update`) answers "is this member
+    verified?" in O(1). Requests go into the guild's queue and return at once.
+    The worker keeps only the latest request per member and works through
+    the queue in passes of `batch_size`. It skips members already in the
+    requested state without calling the API, and waits on a token bucket
+    before each role change. Discord has no bulk role endpoint, so each real change is
+    still one request. Button clicks use an urgent queue that is served
+    ahead of bulk jobs.
+    """
+
+    def __init__(self, bot, role_change_rate=ROLE_CHANGE_RATE, batch_size=BATCH_SIZE):
+        self.bot = bot
+        self.role_change_rate = role_change_rate
+        self.batch_size = batch_size
+        self._guilds = {}  # guild id -> GuildVerification
+
+    # ------------------------------------------------------------------ index
+
+    def index_guild(self, guild, role_id):
+        """(Re)builds a guild's index from the role's current members. Returns the drift that was fixed."""
+        state = self._guilds.get(guild.id)
+        if state is None:
+            state = self._guilds[guild.id] = GuildVerification(guild.id, role_id, self.role_change_rate)
+        state.role_id = role_id
+
+        role = guild.get_role(role_id) if role_id else None
+        verified = {member.id for member in role.members} if role else set()
+        drift = len(verified ^ state.verified)
+        state.verified = verified
+        logging.info(f"🛂 Indexed {len(verified)} verified members in {guild.name}.")
+        return drift
+
+    def ensure_indexed(self, guild, role_id):
+        """Builds the guild's index on first use, e.g. for a click that arrives before `on_ready` indexed it."""
+        if guild.id not in self._guilds:
+            self.index_guild(guild, role_id)
+
+    def is_verified(self, guild_id, member_id):
+        state = self._guilds.get(guild_id)
+        return state is not None and member_id in state.verified
+
+    def verified_ids(self, guild_id):
+        state = self._guilds.get(guild_id)
+        return state.verified if state else set()
+
+    def on_member_update(self, before, after):
+        """Keeps the index current when the verified role is added or removed anywhere."""
+        state = self._guilds.get(after.guild.id)
+        if state is None or not state.role_id:
+            return
+        if after.get_role(state.role_id) is not None:
+            state.verified.add(after.id)
+        else:
+            state.verified.discard(after.id)
+
+    def discard(self, guild_id, member_id):
+        """Forgets a member who left the guild."""
+        state = self._guilds.get(guild_id)
+        if state is not None:
+            state.verified.discard(member_id)
+
+    # ------------------------------------------------------------------ requests
+
+    def request(self, guild_id, member_id, verify=True, urgent=False):
+        """Queues one member's role change and returns a future.
+
+        The future resolves to True once the role changed, False if the member
+        was already in that state, or None if the change failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        state = self._guilds.get(guild_id)
+        if state is None:
+            future.set_result(None)
+            return future
+        state.futures.setdefault(member_id, []).append(future)
+        self._enqueue(state, member_id, verify, urgent)
+        self._start(state)
+        return future
+
+    def request_many(self, guild_id, member_ids, verify=True):
+        """Queues role changes for many members at once. Returns how many were queued."""
+        state = self._guilds.get(guild_id)
+        if state is None:
+            return 0
+        count = 0
+        for member_id in member_ids:
+            self._enqueue(state, member_id, verify, urgent=False)
+            count += 1
+        if count:
+            self._start(state)
+        return count
+
+    @staticmethod
+    def _enqueue(state, member_id, verify, urgent):
+        queued = member_id in state.desired
+        state.desired[member_id] = verify  # the latest request wins
+        if urgent:
+            state.urgent.append(member_id)
+        elif not queued:
+            state.bulk.append(member_id)
+
+    def cancel(self, guild_id):
+        """Drops every queued bulk change for a guild (button clicks stay queued). Returns how many were dropped."""
+        state = self._guilds.get(guild_id)
+        if state is None:
+            return 0
+        urgent = set(state.urgent)
+        dropped = 0
+        for member_id in state.bulk:
+            if member_id in state.desired and member_id not in urgent:
+                del state.desired[member_id]
+                for future in state.futures.pop(member_id, ()):
+                    if not future.done():
+                        future.set_result(None)
+                dropped += 1
+        state.bulk.clear()
+        return dropped
+
+    def _start(self, state):
+        if state.worker is None or state.worker.done():
+            state.worker = asyncio.get_running_loop().create_task(self._run(state))
+
+    # ------------------------------------------------------------------ worker
+
+    def _next(self, state):
+        """Pops the next queued member (button clicks first), or None when the queues are empty."""
+        while state.urgent or state.bulk:
+            member_id = state.urgent.popleft() if state.urgent else state.bulk.popleft()
+            if member_id in state.desired:  # later entries for an already-handled member are stale
+                return member_id, state.desired.pop(member_id), state.futures.pop(member_id, ())
+        return None
+
+    async def _run(self, state):
+        while state.urgent or state.bulk:
+            guild = self.bot.get_guild(state.guild_id)
+            role = guild.get_role(state.role_id) if guild and state.role_id else None
+            if role is None:
+                logging.error(f"❌ Verified role not found in guild {state.guild_id}, dropping {state.pending} changes.")
+
+            # Up to `batch_size` changes per pass; no-ops cost neither an API call nor a token
+            for _ in range(self.batch_size):
+                item = self._next(state)
+                if item is None:
+                    break
+                member_id, verify, futures = item
+                result = await self._apply(state, guild, role, member_id, verify) if role else None
+                for future in futures:
+                    if not future.done():
+                        future.set_result(result)
+
+            if state.pending:
+                logging.info(f"🛂 Guild {state.guild_id}: {state.applied} role changes applied, {state.pending} queued.")
+            await asyncio.sleep(0)  # a pass of pure no-ops never awaited; let other tasks run
+
+    async def _apply(self, state, guild, role, member_id, verify):
+        if (member_id in state.verified) == verify:
+            state.skipped += 1
+            return False
+
+        member = guild.get_member(member_id)
+        if member is None:
+            state.verified.discard(member_id)
+            state.skipped += 1
+            return None
+
+        await state.bucket.acquire()
+        try:
+            with metrics.timer("role_change"):
+                if verify:
+                    await member.add_roles(role, reason="Verification")
+                else:
+                    await member.remove_roles(role, reason="Verification removed")
+        except Exception as e:
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                state.bucket.penalize(retry_after)
+            state.failed += 1
+            logging.error(f"❌ Failed to {'verify' if verify else 'unverify'} member {member_id}: {e}")
+            return None
+
+        if verify:
+            state.verified.add(member_id)
+        else:
+            state.verified.discard(member_id)
+        state.applied += 1
+        return True
+
+    # ------------------------------------------------------------------ reporting
+
+    def stats(self, guild_id):
+        state = self._guilds.get(guild_id)
+        if state is None:
+            return None
+        capacity, per = self.role_change_rate
+        return {
+            "verified": len(state.verified),
+            "pending": state.pending,
+            "applied": state.applied,
+            "skipped": state.skipped,
+            "failed": state.failed,
+            "eta_seconds": state.pending * per / capacity,
+        }
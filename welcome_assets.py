@@ -0,0 +1,244 @@
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict
+
+# PIL is imported where it's used, so importing the bot doesn't load it before connecting
+
+# Extensions accepted as welcome backgrounds
+BACKGROUND_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Default font used for the welcome text
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+# Upper bound on decoded background pixels kept in memory (RGBA, 4 bytes per pixel)
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Backgrounds larger than this (longest side, in pixels) are downscaled once at load
+DEFAULT_MAX_OUTPUT_SIZE = 1024
+
+# Rendered username masks kept between welcomes
+DEFAULT_MAX_TEXT_MASKS = 512
+
+# Welcome text layout at a background's original size; scaled with the background
+BASE_FONT_SIZE = 90
+BASE_TEXT_POSITION = (100, 100)
+BASE_OUTLINE_WIDTH = 3
+WELCOME_LINE = "Welcome,"
+
+
+class TextMask:
+    """A rasterized line of text: glyph coverage plus the same mask dilated into an outline."""
+
+    __slots__ = ("offset", "fill", "outline", "nbytes")
+
+    def __init__(self, offset, fill, outline):
+        self.offset = offset  # top-left of the masks relative to the text origin
+        self.fill = fill
+        self.outline = outline
+        self.nbytes = fill.width * fill.height * 2
+
+
+def build_text_mask(text, font, outline_width):
+    """Rasterizes `text` once and grows it by `outline_width` pixels for the outline."""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    left, top, right, bottom = font.getbbox(text)
+    pad = outline_width
+    size = (max(1, right - left + 2 * pad), max(1, bottom - top + 2 * pad))
+    fill = Image.new("L", size, 0)
+    ImageDraw.Draw(fill).text((pad - left, pad - top), text, font=font, fill=255)
+    outline = fill.filter(ImageFilter.MaxFilter(2 * outline_width + 1)) if outline_width else fill
+    return TextMask((left - pad, top - pad), fill, outline)
+
+
+class WelcomeTemplate:
+    """Everything about a background that doesn't change between welcomes.
+
+    Holds the decoded (and size-capped) base image, the font and layout scaled
+    to it, and the pre-rasterized "Welcome," line.
+    """
+
+    __slots__ = ("base", "font", "position", "line_step", "outline_width", "welcome", "nbytes")
+
+    def __init__(self, base, font, position, line_step, outline_width, welcome):
+        self.base = base
+        self.font = font
+        self.position = position
+        self.line_step = line_step
+        self.outline_width = outline_width
+        self.welcome = welcome
+        self.nbytes = base.width * base.height * 4 + welcome.nbytes
+
+
+class WelcomeAssetCache:
+    """Keeps welcome templates, fonts and username masks in memory between renders.
+
+    Templates are held in a size-bounded LRU keyed by filename. Each entry
+    remembers the file's mtime and size so an edited or replaced file is
+    reloaded, and the directory listing is refreshed whenever the directory's
+    own mtime changes (files added or removed). Username masks live in a
+    separate LRU so repeat names (and `!testwelcome`) skip rasterizing.
+    """
+
+    def __init__(self, background_dir, font_path=FONT_PATH, max_bytes=DEFAULT_MAX_CACHE_BYTES,
+                 max_output_size=DEFAULT_MAX_OUTPUT_SIZE, max_text_masks=DEFAULT_MAX_TEXT_MASKS):
+        self.background_dir = background_dir
+        self.font_path = font_path
+        self.max_bytes = max_bytes
+        self.max_output_size = max_output_size
+        self.max_text_masks = max_text_masks
+
+        self._lock = threading.Lock()
+        self._templates = OrderedDict()  # filename -> (signature, WelcomeTemplate)
+        self._text_masks = OrderedDict()  # (text, font size, outline width) -> TextMask
+        self._fonts = {}
+        self._listing = []
+        self._listing_mtime = None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------ listing
+
+    def background_files(self):
+        """Returns the background filenames, re-listing only when the directory changes."""
+        try:
+            dir_mtime = os.stat(self.background_dir).st_mtime_ns
+        except OSError as e:
+            logging.error(f"❌ Background directory unavailable: {e}")
+            return []
+
+        with self._lock:
+            if dir_mtime != self._listing_mtime:
+                self._listing = sorted(
+                    f for f in os.listdir(self.background_dir) if f.endswith(BACKGROUND_EXTENSIONS)
+                )
+                self._listing_mtime = dir_mtime
+                # Drop cached entries for files that no longer exist
+                for name in list(self._templates):
+                    if name not in self._listing:
+                        self._evict(name)
+            return list(self._listing)
+
+    # ------------------------------------------------------------------ templates
+
+    def _evict(self, name):
+        _, template = self._templates.pop(name)
+        self.current_bytes -= template.nbytes
+
+    def _build_template(self, path):
+        from PIL import Image, ImageDraw
+
+        with Image.open(path) as raw:
+            base = raw.convert("RGBA")
+        base.load()
+
+        # Cap the output size; the text layout scales with the background
+        scale = 1.0
+        longest = max(base.size)
+        if self.max_output_size and longest > self.max_output_size:
+            scale = self.max_output_size / longest
+            base = base.resize((max(1, round(base.width * scale)), max(1, round(base.height * scale))), Image.LANCZOS)
+
+        font = self.get_font(max(1, round(BASE_FONT_SIZE * scale)))
+        position = (round(BASE_TEXT_POSITION[0] * scale), round(BASE_TEXT_POSITION[1] * scale))
+        outline_width = max(1, round(BASE_OUTLINE_WIDTH * scale))
+
+        # Distance between the two lines, as ImageDraw.multiline_text would lay them out
+        draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+        line_step = draw.multiline_textbbox((0, 0), "A\nA", font=font)[3] - draw.textbbox((0, 0), "A", font=font)[3]
+
+        welcome = build_text_mask(WELCOME_LINE, font, outline_width)
+        return WelcomeTemplate(base, font, position, line_step, outline_width, welcome)
+
+    def get_template(self, name):
+        """Returns the cached template for background `name` (do not draw on its base)."""
+        path = os.path.join(self.background_dir, name)
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._templates.get(name)
+            if entry and entry[0] == signature:
+                self._templates.move_to_end(name)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                self._evict(name)
+
+        self.misses += 1
+        template = self._build_template(path)
+
+        with self._lock:
+            if name in self._templates:
+                self._evict(name)
+            if template.nbytes <= self.max_bytes:
+                self._templates[name] = (signature, template)
+                self.current_bytes += template.nbytes
+                while self.current_bytes > self.max_bytes:
+                    oldest = next(iter(self._templates))
+                    self._evict(oldest)
+        return template
+
+    def random_template(self):
+        """Picks a random background and returns (filename, template) or (None, None)."""
+        files = self.background_files()
+        if not files:
+            return None, None
+        name = random.choice(files)
+        return name, self.get_template(name)
+
+    def get_text_mask(self, text, font, outline_width):
+        """Returns the rasterized mask for a line of text, building it at most once while cached."""
+        key = (text, font.size, outline_width)
+        with self._lock:
+            mask = self._text_masks.get(key)
+            if mask is not None:
+                self._text_masks.move_to_end(key)
+                return mask
+
+        mask = build_text_mask(text, font, outline_width)
+        with self._lock:
+            self._text_masks[key] = mask
+            while len(self._text_masks) > self.max_text_masks:
+                self._text_masks.popitem(last=False)
+        return mask
+
+    def warm(self):
+        """Builds every background's template up front (until the cache budget is full)."""
+        for name in self.background_files():
+            try:
+                self.get_template(name)
+            except OSError as e:
+                logging.error(f"❌ Failed to preload background {name}: {e}")
+            if self.current_bytes >= self.max_bytes:
+                break
+        logging.info(f"🎨 Preloaded {len(self._templates)} welcome templates ({self.current_bytes // 1024} KiB)")
+
+    # ------------------------------------------------------------------ fonts
+
+    def get_font(self, size):
+        """Returns the welcome font at `size`, loading it only once."""
+        font = self._fonts.get(size)
+        if font is None:
+            from PIL import ImageFont
+
+            try:
+                font = ImageFont.truetype(self.font_path, size)
+            except OSError:
+                logging.warning(f"⚠️ Font {self.font_path} not found, using PIL default font.")
+                font = ImageFont.load_default(size)
+            self._fonts[size] = font
+        return font
+
+    def stats(self):
+        return {
+            "templates": len(self._templates),
+            "text_masks": len(self._text_masks),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,245 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from log_setup import setup_worker_logging
+from welcome_assets import WelcomeAssetCache, DEFAULT_MAX_CACHE_BYTES, DEFAULT_MAX_OUTPUT_SIZE, WELCOME_LINE
+
+# Asset cache for this process (each pool worker process builds its own)
+_assets = None
+
+# Output formats the renderer can encode to
+IMAGE_FORMATS = ("png", "webp")
+
+# Outline strategies: "legacy" redraws the text once per offset, "stroke" uses
+# FreeType's native stroker and "dilate" grows a single glyph mask
+OUTLINE_MODES = ("legacy", "stroke", "dilate")
+
+# Outline thickness in pixels
+OUTLINE_WIDTH = 3
+
+
+def draw_outlined_text(image, position, text, font, fill, outline_fill, mode="dilate", width=OUTLINE_WIDTH):
+    """Draws `text` on `image` with a `width`-pixel outline using the given strategy."""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    draw = ImageDraw.Draw(image)
+
+    if mode == "legacy":
+        offsets = [o for o in range(-width, width + 1) if o != 0]
+
+        # ✅ Draw outline first (multiple times for effect)
+        for x_offset in offsets:
+            for y_offset in offsets:
+                outline_position = (position[0] + x_offset, position[1] + y_offset)
+                draw.text(outline_position, text, font=font, fill=outline_fill)
+
+        # ✅ Draw main text on top
+        draw.text(position, text, font=font, fill=fill)
+
+    elif mode == "stroke":
+        # ✅ One layout pass, FreeType strokes the glyph edges
+        draw.text(position, text, font=font, fill=fill, stroke_width=width, stroke_fill=outline_fill)
+
+    elif mode == "dilate":
+        # ✅ Rasterize the glyphs once into a mask covering just the text box
+        left, top, right, bottom = draw.multiline_textbbox(position, text, font=font)
+        left, top = left - width, top - width
+        box_size = (right - left + width, bottom - top + width)
+        mask = Image.new("L", box_size, 0)
+        ImageDraw.Draw(mask).multiline_text((position[0] - left, position[1] - top), text, font=font, fill=255)
+
+        # ✅ Grow the mask by `width` pixels for the outline, then composite both colors
+        outline_mask = mask.filter(ImageFilter.MaxFilter(2 * width + 1))
+        image.paste(outline_fill, (left, top, left + box_size[0], top + box_size[1]), outline_mask)
+        image.paste(fill, (left, top, left + box_size[0], top + box_size[1]), mask)
+
+    else:
+        raise ValueError(f"Unknown outline mode: {mode}")
+
+
+def configure_assets(background_dir, max_bytes=DEFAULT_MAX_CACHE_BYTES, warm=False, max_output_size=DEFAULT_MAX_OUTPUT_SIZE):
+    """Creates this process's welcome asset cache (no-op if already configured for `background_dir`)."""
+    global _assets
+    if _assets is None or _assets.background_dir != background_dir:
+        _assets = WelcomeAssetCache(background_dir, max_bytes=max_bytes, max_output_size=max_output_size)
+    if warm:
+        _assets.warm()
+    return _assets
+
+
+def _init_worker(background_dir, max_bytes, max_output_size):
+    """Process pool initializer: fixes up inherited logging, then builds and warms the asset cache."""
+    setup_worker_logging()
+    configure_assets(background_dir, max_bytes, warm=True, max_output_size=max_output_size)
+
+
+def _worker_ready():
+    """Warm-up task: returns once this worker's initializer has run.
+
+    The short hold keeps one worker from taking every warm-up task, so each
+    worker gets one and has to finish starting before `warm` returns.
+    """
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def paste_text_mask(image, mask, origin, fill, outline_fill):
+    """Composites a cached TextMask onto `image` at the text origin, outline first."""
+    left, top = origin[0] + mask.offset[0], origin[1] + mask.offset[1]
+    box = (left, top, left + mask.fill.width, top + mask.fill.height)
+    image.paste(outline_fill, box, mask.outline)
+    image.paste(fill, box, mask.fill)
+
+
+def get_assets():
+    return _assets
+
+
+def generate_welcome_image(username, image_format="png", compress_level=6, quality=80, outline_mode="dilate"):
+    """Generates a welcome image with a random background and returns the encoded bytes.
+
+    `compress_level` (0-9) applies to PNG, `quality` (1-100) to lossy WebP.
+    """
+    try:
+        if _assets is None:
+            logging.error("❌ Welcome assets have not been configured!")
+            return None
+
+        # ✅ Get the cached template (base image, font, layout, "Welcome," masks) for a random background
+        random_background, template = _assets.random_template()
+        if template is None:
+            logging.error("❌ No background images found in the directory!")
+            return None
+
+        logging.info(f"🎨 Selected background: {random_background}")
+
+        background = template.base.copy()
+        text_color = (random.randint(1, 255), random.randint(1, 255), random.randint(1, 255))
+        outline_color = (random.randint(1, 255), random.randint(1, 255), random.randint(1, 255))
+
+        if outline_mode == "dilate":
+            # ✅ Composite cached masks in this welcome's colors, no glyph rendering for known names
+            x, y = template.position
+            name_mask = _assets.get_text_mask(f"{username}!", template.font, template.outline_width)
+            paste_text_mask(background, template.welcome, (x, y), text_color, outline_color)
+            paste_text_mask(background, name_mask, (x, y + template.line_step), text_color, outline_color)
+        else:
+            text = f"{WELCOME_LINE}\n{username}!"
+            draw_outlined_text(background, template.position, text, template.font, text_color, outline_color,
+                               mode=outline_mode, width=template.outline_width)
+
+        # ✅ Encode straight to memory, no temp file
+        buffer = io.BytesIO()
+        if image_format == "webp":
+            background.save(buffer, format="WEBP", quality=quality, method=4)
+        else:
+            background.save(buffer, format="PNG", compress_level=compress_level)
+        return buffer.getvalue()
+
+    except Exception as e:
+        logging.error(f"❌ Error generating welcome image: {e}")
+        return None
+
+
+class WelcomeRenderer:
+    """Runs `generate_welcome_image` on a thread or process pool.
+
+    At most `max_pending` renders may be queued or running at once. Past that,
+    `render` returns None right away so a join flood falls back to the
+    text-only welcome instead of piling up work behind the event loop.
+    """
+
+    def __init__(self, background_dir, mode="thread", workers=2, max_pending=8, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES,
+                 image_format="png", compress_level=6, quality=80, outline_mode="dilate",
+                 max_output_size=DEFAULT_MAX_OUTPUT_SIZE):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown render mode: {mode}")
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
+        if outline_mode not in OUTLINE_MODES:
+            raise ValueError(f"Unknown outline mode: {outline_mode}")
+        self.background_dir = background_dir
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_cache_bytes = max_cache_bytes
+        self.image_format = image_format
+        self.compress_level = compress_level
+        self.quality = quality
+        self.outline_mode = outline_mode
+        self.max_output_size = max_output_size
+
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def filename(self):
+        """Attachment filename matching the configured output format."""
+        return f"welcome.{self.image_format}"
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == "process":
+                # Every worker process decodes its own copy of the assets on start. Workers come
+                # from a forkserver, never a fork of this process and its logging/writer threads.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    initializer=_init_worker,
+                    initargs=(self.background_dir, self.max_cache_bytes, self.max_output_size),
+                )
+            else:
+                configure_assets(self.background_dir, self.max_cache_bytes, max_output_size=self.max_output_size)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="welcome-render")
+        return self._executor
+
+    async def warm(self):
+        """Starts the pool and preloads assets without blocking the event loop."""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            await loop.run_in_executor(executor, get_assets().warm)
+        else:
+            # The pool forks lazily; one task per worker starts every process (and its asset decode) now
+            pids = await asyncio.gather(*(loop.run_in_executor(executor, _worker_ready) for _ in range(self.workers)))
+            logging.info(f"🎨 Started {len(set(pids))} welcome render worker process(es).")
+
+    async def render(self, username):
+        """Renders a welcome image off the event loop.
+
+        Returns an in-memory buffer ready for `discord.File`, or None when the
+        queue is full or rendering failed.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logging.warning(f"⚠️ Welcome render queue full ({self.pending} pending), skipping image for {username}.")
+            return None
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(
+                self._get_executor(),
+                generate_welcome_image,
+                username,
+                self.image_format,
+                self.compress_level,
+                self.quality,
+                self.outline_mode,
+            )
+            # BytesIO shares the bytes object's memory until written to, so this is not a copy
+            return io.BytesIO(data) if data else None
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None